@@ -0,0 +1,11 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedCursorPagination(CursorPagination):
+    """
+    Newest first, paged by an opaque cursor: deep pages cost the same as the
+    first and rows inserted meanwhile never shift a device's position.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,10 @@
+from rest_framework.permissions import BasePermission
+
+from warehouse.permissions import is_warehouse_staff
+
+
+class IsWarehouseStaff(BasePermission):
+    """Same audience as the warehouse pages, checked from the cached group memberships."""
+
+    def has_permission(self, request, view):
+        return is_warehouse_staff(request.user)
@@ -0,0 +1,72 @@
+from rest_framework import serializers
+
+from store.models import Product, StockMovement, Variation
+
+
+def requested_fields(request):
+    """Field names asked for with ?fields=a,b (sparse fieldset), or None for all."""
+    raw = request.query_params.get('fields', '') if request is not None else ''
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    return names or None
+
+
+class SparseFieldsMixin:
+    """Drop every field not listed in ?fields= of the current request."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = requested_fields(self.context.get('request'))
+        if names is not None:
+            for name in set(self.fields) - names:
+                self.fields.pop(name)
+
+
+class VariationSerializer(serializers.ModelSerializer):
+    category = serializers.CharField(source='variation_category')
+    value = serializers.CharField(source='variation_value')
+
+    class Meta:
+        model = Variation
+        fields = ['id', 'category', 'value']
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    name = serializers.CharField(source='product_name')
+    category = serializers.CharField(source='category_slug')
+    url = serializers.CharField(source='get_url')
+    image = serializers.ImageField(source='images', use_url=True)
+    # Filled by the viewset's Prefetch(to_attr='options')
+    variations = VariationSerializer(source='options', many=True)
+
+    class Meta:
+        model = Product
+        fields = [
+            'sku', 'name', 'slug', 'category', 'description', 'price', 'stock', 'total_in', 'total_out',
+            'is_available', 'url', 'image', 'variations', 'created_at', 'modified_date',
+        ]
+        read_only_fields = fields
+
+
+class StockSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['sku', 'stock', 'total_in', 'total_out', 'modified_date']
+        read_only_fields = fields
+
+
+class MovementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    sku = serializers.CharField(source='product.sku')
+    type = serializers.CharField(source='movement_type')
+    line_value = serializers.SerializerMethodField()
+    created_by = serializers.EmailField(source='created_by.email', default=None)
+
+    class Meta:
+        model = StockMovement
+        fields = [
+            'id', 'sku', 'type', 'quantity', 'unit_price', 'line_value', 'balance_after',
+            'ref_type', 'ref_no', 'remark', 'created_by', 'created_at',
+        ]
+        read_only_fields = fields
+
+    def get_line_value(self, movement):
+        return movement.quantity * movement.unit_price
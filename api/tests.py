@@ -0,0 +1,200 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import Account
+from category.models import Category
+from store.models import Product, StockMovement, Variation
+from store.tests import TEST_STORAGES
+from warehouse.services import post_movement
+
+
+class CatalogApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = category = Category.objects.create(
+            category_name='Footwear', slug='footwear', sku_prefix='FW',
+        )
+        self.products = []
+        for i in range(3):
+            product = Product.objects.create(
+                product_name=f'Shoe {i}', slug=f'shoe-{i}', price=10, stock=0, category=category,
+            )
+            Variation.objects.create(product=product, variation_category='size', variation_value='42')
+            post_movement(product, StockMovement.IN, 4, unit_price=5)
+            self.products.append(product)
+        user = Account.objects.create_superuser(
+            first_name='Ware', last_name='House', username='admin', email='admin@example.com', password='pw',
+        )
+        self.client.force_login(user)
+
+    def test_requires_warehouse_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api-product-list')).status_code, 403)
+
+    def test_product_list_is_cursor_paginated(self):
+        url = reverse('api-product-list')
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Shoe 2', 'Shoe 1'])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Shoe 0'])
+
+    def test_product_detail_queries_are_constant(self):
+        url = reverse('api-product-detail', args=[self.products[0].sku])
+        self.client.get(url)  # create the cache versions
+        # session, user, cache versions, product, variations
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        variations = response.json()['variations']
+        self.assertEqual([(row['category'], row['value']) for row in variations], [('size', '42')])
+        with self.assertNumQueries(5):
+            self.client.get(reverse('api-product-list'))
+
+    def test_sparse_fieldset(self):
+        response = self.client.get(reverse('api-stock-list'), {'fields': 'sku,stock', 'sku': self.products[1].sku})
+        self.assertEqual(response.json()['results'], [{'sku': self.products[1].sku, 'stock': 4}])
+
+    def test_etag_revalidation(self):
+        url = reverse('api-movement-list')
+        etag = self.client.get(url)['ETag']
+        # session and user, then a single read of the cache versions
+        with self.assertNumQueries(3):
+            response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(STORAGES=TEST_STORAGES, QR_CODE_WORKERS=0)
+    def test_etag_follows_catalog_and_category_changes(self):
+        urls = [reverse(name) for name in ('api-product-list', 'api-stock-list', 'api-movement-list')]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(product_name='Boot', slug='boot', price=10, stock=0, category=self.category)
+        for url in urls:
+            self.assertEqual(self.client.get(url, headers={'if-none-match': etags[url]}).status_code, 200)
+
+        url = urls[0]
+        etag = self.client.get(url)['ETag']
+        self.category.slug = 'shoes'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/shoes/', response.json()['results'][0]['url'])
+
+
+class ScanBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        self.shoe, self.boot = (
+            Product.objects.create(product_name=name, slug=name.lower(), price=10, stock=0, category=category)
+            for name in ('Shoe', 'Boot')
+        )
+        user = Account.objects.create_superuser(
+            first_name='Ware', last_name='House', username='admin', email='admin@example.com', password='pw',
+        )
+        self.client.force_login(user)
+
+    def post(self, scans):
+        return self.client.post(reverse('api-scan-batch'), scans, content_type='application/json')
+
+    def test_posts_all_items(self):
+        response = self.post([
+            {'sku': self.shoe.sku, 'action': 'IN', 'quantity': 5, 'ref_type': 'SUP_INV', 'ref_no': 'A1'},
+            {'sku': self.boot.sku, 'action': 'IN', 'quantity': 2},
+            {'sku': self.shoe.sku, 'action': 'OUT', 'quantity': 3, 'ref_type': 'CUS_INV'},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['balance_after'] for row in response.json()['results']], [5, 2, 2])
+        self.shoe.refresh_from_db()
+        self.assertEqual((self.shoe.stock, self.shoe.total_in, self.shoe.total_out), (2, 5, 3))
+
+    def test_invalid_item_rejects_batch(self):
+        response = self.post([
+            {'sku': self.shoe.sku, 'action': 'IN', 'quantity': 5},
+            {'sku': self.shoe.sku, 'action': 'IN', 'quantity': 1, 'ref_type': 'CUS_INV'},
+            {'sku': 'NOPE', 'action': 'IN', 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([row['ok'] for row in response.json()['results']], [True, False, False])
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_insufficient_stock_rejects_batch(self):
+        response = self.post([
+            {'sku': self.boot.sku, 'action': 'IN', 'quantity': 1},
+            {'sku': self.shoe.sku, 'action': 'OUT', 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([row['ok'] for row in response.json()['results']], [True, False])
+        self.assertFalse(StockMovement.objects.exists())
+        self.boot.refresh_from_db()
+        self.assertEqual(self.boot.stock, 0)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        self.shoe, self.boot = (
+            Product.objects.create(product_name=name, slug=name.lower(), price=10, stock=0, category=category)
+            for name in ('Shoe', 'Boot')
+        )
+        user = Account.objects.create_superuser(
+            first_name='Ware', last_name='House', username='admin', email='admin@example.com', password='pw',
+        )
+        self.client.force_login(user)
+
+    def sync(self, watermark, scans):
+        response = self.client.post(
+            reverse('api-sync'), {'watermark': watermark, 'scans': scans}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_replayed_sync_posts_once(self):
+        scans = [
+            {'sku': self.shoe.sku, 'action': 'IN', 'quantity': 4, 'idempotency_key': 'dev1-1'},
+            {'sku': self.shoe.sku, 'action': 'OUT', 'quantity': 9, 'idempotency_key': 'dev1-2'},
+            {'sku': self.shoe.sku, 'action': 'OUT', 'quantity': 1},
+        ]
+        first = self.sync(None, scans)
+        self.assertEqual([row['ok'] for row in first['results']], [True, False, False])
+        self.assertEqual(first['stock'], {self.shoe.sku: 4, self.boot.sku: 0})
+
+        replay = self.sync(None, scans[:1])
+        self.assertEqual(replay['posted'], 0)
+        self.assertTrue(replay['results'][0]['duplicate'])
+        self.assertEqual(replay['results'][0]['id'], first['results'][0]['id'])
+        self.assertEqual(StockMovement.objects.count(), 1)
+
+        # only products moved since the watermark come back
+        delta = self.sync(first['watermark'], [
+            {'sku': self.boot.sku, 'action': 'IN', 'quantity': 2, 'idempotency_key': 'dev1-3'},
+        ])
+        self.assertEqual(delta['stock'], {self.boot.sku: 2})
+        self.assertEqual(self.sync(delta['watermark'], [])['stock'], {})
+
+    def test_new_products_and_edited_stock_reach_the_delta(self):
+        first = self.sync(None, [])
+        category = self.shoe.category
+        new = Product.objects.create(product_name='Sandal', slug='sandal', price=10, stock=7, category=category)
+        [bulk] = Product.objects.create_many(
+            [Product(product_name='Clog', slug='clog', price=10, stock=3, category=category)], qr_codes=False,
+        )
+        edited = Product.objects.get(pk=self.shoe.pk)  # as the admin loads it
+        edited.stock = 99
+        edited.save()
+        # saving without touching stock is not a change
+        Product.objects.get(pk=self.boot.pk).save()
+
+        delta = self.sync(first['watermark'], [])
+        self.assertEqual(delta['stock'], {new.sku: 7, bulk.sku: 3, self.shoe.sku: 99})
+
+    def test_batch_skips_posted_keys(self):
+        scan = {'sku': self.boot.sku, 'action': 'IN', 'quantity': 3, 'idempotency_key': 'dev2-1'}
+        url = reverse('api-scan-batch')
+        self.client.post(url, [scan], content_type='application/json')
+        response = self.client.post(url, [scan, scan], content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['posted'], 0)
+        self.boot.refresh_from_db()
+        self.assertEqual(self.boot.stock, 3)
@@ -0,0 +1,15 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+router = DefaultRouter()
+router.register('products', views.ProductViewSet, basename='api-product')
+router.register('stock', views.StockViewSet, basename='api-stock')
+router.register('movements', views.MovementViewSet, basename='api-movement')
+
+urlpatterns = [
+    path('v1/scans/', views.ScanBatchView.as_view(), name='api-scan-batch'),
+    path('v1/sync/', views.SyncView.as_view(), name='api-sync'),
+    path('v1/', include(router.urls)),
+]
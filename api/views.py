@@ -0,0 +1,295 @@
+"""
+JSON API (v1) for handheld scanners and POS terminals.
+
+Catalog and stock are read-only; movements are written through the batch
+scan endpoint. Every list is cursor paginated, every endpoint accepts ?fields=a,b to
+return only those fields, and responses carry an ETag made of the cache
+versions their payload depends on, so a device polling an unchanged
+resource gets an empty 304 without the view touching the database.
+"""
+import hashlib
+
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from chuefamily.cache import get_version
+from store.models import Product, StockMovement, Variation
+from warehouse import sync
+from warehouse.importers import build_movement
+from warehouse.services import InsufficientStock, post_new_movements
+from warehouse.utils import date_range_filter
+from .serializers import MovementSerializer, ProductSerializer, StockSerializer, requested_fields
+
+
+class NotModified(Exception):
+    pass
+
+
+class VersionETagMixin:
+    """
+    ETag / If-None-Match for read-only endpoints, from cache versions.
+
+    Checked in initial(), i.e. after authentication and permissions but
+    before the handler runs any query.
+    """
+    # Products are created and renamed under 'catalog' and only restocked
+    # under 'stock', so any list of products or movements needs both
+    etag_namespaces = ('catalog', 'stock')
+
+    def get_etag(self, request):
+        versions = [get_version(namespace) for namespace in self.etag_namespaces]
+        raw = '|'.join(map(str, [*versions, request.accepted_media_type, request.get_full_path()]))
+        return '"%s"' % hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            self.etag = self.get_etag(request)
+            if_none_match = request.headers.get('If-None-Match', '')
+            if self.etag in (tag.strip() for tag in if_none_match.split(',')):
+                raise NotModified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, 'etag', None)
+        if etag and response.status_code in (200, 304):
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Accept', 'Authorization', 'Cookie'))
+        return response
+
+
+def _movement_filters(queryset, params):
+    """?type=IN|OUT, ?start=/?end= (local days) and ?since= (ISO datetime)."""
+    movement_type = (params.get('type') or '').upper()
+    if movement_type in (StockMovement.IN, StockMovement.OUT):
+        queryset = queryset.filter(movement_type=movement_type)
+    start = parse_date(params.get('start') or '')
+    end = parse_date(params.get('end') or '')
+    queryset = queryset.filter(**date_range_filter(start, end))
+    since = parse_datetime(params.get('since') or '')
+    if since is not None:
+        queryset = queryset.filter(created_at__gt=since)
+    return queryset
+
+
+class ProductViewSet(VersionETagMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Products by SKU, with their active variations.
+
+    Filters: ?category=<slug>, ?available=1|0.
+    """
+    serializer_class = ProductSerializer
+    lookup_field = 'sku'
+    lookup_value_regex = '[^/]+'
+    # the payload carries the category slug and the product URL built from it
+    etag_namespaces = ('catalog', 'category', 'stock')
+
+    def get_queryset(self):
+        queryset = Product.objects.with_urls().select_related('category')
+        fields = requested_fields(self.request)
+        if fields is None or 'variations' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('variation_set', Variation.objects.options(), to_attr='options')
+            )
+
+        params = self.request.query_params
+        if params.get('category'):
+            queryset = queryset.filter(category__slug=params['category'])
+        if params.get('available') in ('1', 'true'):
+            queryset = queryset.filter(is_available=True)
+        elif params.get('available') in ('0', 'false'):
+            queryset = queryset.filter(is_available=False)
+        return queryset
+
+    @action(detail=True)
+    def movements(self, request, sku=None):
+        """Stock movements of one product, newest first. Same filters as /movements/."""
+        product = self.get_object()
+        queryset = _movement_filters(
+            StockMovement.objects.filter(product=product).select_related('product', 'created_by'),
+            request.query_params,
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = MovementSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+
+class StockViewSet(VersionETagMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Stock levels only, the smallest payload for polling devices.
+
+    ?sku=A,B limits the list to those SKUs.
+    """
+    serializer_class = StockSerializer
+    lookup_field = 'sku'
+    lookup_value_regex = '[^/]+'
+
+    def get_queryset(self):
+        queryset = Product.objects.only('id', 'sku', 'stock', 'total_in', 'total_out', 'modified_date', 'created_at')
+        skus = [sku.strip() for sku in self.request.query_params.get('sku', '').split(',') if sku.strip()]
+        if skus:
+            queryset = queryset.filter(sku__in=skus)
+        return queryset
+
+
+class MovementViewSet(VersionETagMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    All stock movements, newest first.
+
+    Filters: ?type=IN|OUT, ?sku=, ?start=/?end= (YYYY-MM-DD), ?since=<ISO datetime>.
+    """
+    serializer_class = MovementSerializer
+
+    def get_queryset(self):
+        queryset = StockMovement.objects.select_related('product', 'created_by')
+        sku = self.request.query_params.get('sku')
+        if sku:
+            queryset = queryset.filter(product__sku=sku)
+        return _movement_filters(queryset, self.request.query_params)
+
+
+def _build_scans(items, user):
+    """Unsaved movements and per-item results for a list of scan dicts."""
+    skus = {str(item.get('sku') or '').strip() for item in items if isinstance(item, dict)}
+    products = Product.objects.filter(sku__in=skus).only('id', 'sku').in_bulk(field_name='sku')
+
+    movements, results = [], []
+    for item in items:
+        if not isinstance(item, dict):
+            item, movement, error = {}, None, 'not a JSON object'
+        else:
+            movement, error = build_movement(item, products, created_by=user)
+        movements.append(movement)
+        results.append({
+            'sku': item.get('sku'),
+            'idempotency_key': item.get('idempotency_key'),
+            'ok': error is None,
+            'error': error,
+        })
+    return movements, results
+
+
+def _fill_results(results, movements, posted, ids):
+    """Add the movement id (and balance for new ones) to each accepted result."""
+    posted = {id(m) for m in posted}
+    for result, movement in zip(results, movements):
+        if movement is None or not result['ok']:
+            continue
+        if id(movement) in posted:
+            result.update(id=movement.pk, balance_after=movement.balance_after, duplicate=False)
+        else:
+            result.update(id=ids.get(movement.idempotency_key), duplicate=True)
+
+
+class ScanBatchView(APIView):
+    """
+    Post many scans in one request.
+
+    Body: a JSON list (or {"scans": [...]}) of
+    {sku, action, quantity, ref_type, ref_no, remark, unit_price,
+    idempotency_key}, the last five optional. All SKUs are resolved with
+    one query, every item is checked with the scan form rules, and the
+    whole batch is posted in one transaction: either every item is
+    recorded (201) or none is (400/409), with one result per item in
+    request order. Items whose idempotency_key was already posted come
+    back as duplicates instead of being posted twice.
+    """
+    max_items = 1000
+
+    def post(self, request):
+        items = request.data.get('scans') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'Expected a non-empty list of scans.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response(
+                {'detail': f'At most {self.max_items} scans per request.'}, status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        movements, results = _build_scans(items, request.user)
+        if any(not result['ok'] for result in results):
+            return Response({'posted': 0, 'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            posted, ids = post_new_movements(movements)
+        except InsufficientStock as exc:
+            for result, movement in zip(results, movements):
+                if movement is exc.movement:
+                    result.update(ok=False, error=str(exc))
+            return Response({'posted': 0, 'results': results}, status=status.HTTP_409_CONFLICT)
+
+        _fill_results(results, movements, posted, ids)
+        return Response({'posted': len(posted), 'results': results}, status=status.HTTP_201_CREATED)
+
+
+class SyncView(APIView):
+    """
+    Offline scanner sync: upload the queued scans, download stock changes.
+
+    Body: {"watermark": <from the previous sync, or null>, "scans": [...]}.
+    Every scan needs an idempotency_key, so a sync that is retried after a
+    dropped connection posts nothing twice. Unlike the batch endpoint, good
+    scans are posted even when others are rejected (unknown SKU, not
+    enough stock), because a device cannot fix its history; rejected items
+    come back with their error and should be dropped from the queue.
+
+    The response carries a new watermark (see warehouse.sync) and the
+    stock of every product changed since the old one, as {sku: stock}, or
+    of all products on a first sync. A change that commits during the
+    sync may be reported twice, but is never missed.
+    """
+    max_items = 1000
+
+    def post(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        watermark = data.get('watermark')
+        if watermark is not None and (not isinstance(watermark, int) or watermark < 0):
+            return Response(
+                {'detail': 'watermark must be the value from the previous sync or null.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        items = data.get('scans') or []
+        if not isinstance(items, list) or len(items) > self.max_items:
+            return Response(
+                {'detail': f'scans must be a list of at most {self.max_items} items.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        movements, results = _build_scans(items, request.user)
+        for result, movement in zip(results, movements):
+            if result['ok'] and not movement.idempotency_key:
+                result.update(ok=False, error='idempotency_key is required')
+
+        pending = [m for m, result in zip(movements, results) if result['ok']]
+        posted, ids = [], {}
+        while pending:
+            try:
+                posted, ids = post_new_movements(pending)
+                break
+            except InsufficientStock as exc:
+                # reject the scan that would drive stock negative and post the rest
+                for result, movement in zip(results, movements):
+                    if movement is exc.movement:
+                        result.update(ok=False, error=str(exc))
+                pending = [m for m in pending if m is not exc.movement]
+        _fill_results(results, movements, posted, ids)
+
+        # Taken before the delta query, so a change committed in between is reported twice, never missed
+        new_watermark = sync.watermark()
+        products = Product.objects.all() if watermark is None else sync.changed_since(watermark)
+        return Response({
+            'watermark': new_watermark,
+            'posted': len(posted),
+            'results': results,
+            'stock': dict(products.values_list('sku', 'stock')),
+        })
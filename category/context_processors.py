@@ -1,6 +1,43 @@
+from django.core.cache import cache
+
+from chuefamily.cache import get_version
 from .models import Category
 
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Per-process copy of the menu for the current version: no unpickling per render
+_local = {}
+
+
+def get_menu_links():
+    """
+    The category menu as plain dicts with get_url already resolved.
+
+    Cached in-process and in the shared cache under the 'category' version,
+    which category.signals bumps on every Category save/delete. Inside a
+    request that version is pinned by PinnedVersionsMiddleware, so a warm
+    menu costs no query of its own.
+    """
+    version = get_version('category')
+    links = _local.get(version)
+    if links is None:
+        key = f'category:{version}:menu'
+        links = cache.get(key)
+        if links is None:
+            links = [
+                {
+                    'id': category.id,
+                    'category_name': category.category_name,
+                    'slug': category.slug,
+                    'get_url': category.get_url(),
+                }
+                for category in Category.objects.order_by('id')
+            ]
+            cache.set(key, links, MENU_CACHE_TIMEOUT)
+        _local.clear()
+        _local[version] = links
+    return links
+
 
 def menu_links(request):
-    links = Category.objects.all()
-    return dict(links=links)
\ No newline at end of file
+    return dict(links=get_menu_links())
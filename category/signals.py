@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from chuefamily.cache import bump_version
+from store import search, thumbnails
+from store.models import Product
+from .models import Category
+
+# Products reindexed per statement after a category is renamed
+REINDEX_BATCH_SIZE = 500
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_menu(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('category'))
+
+
+@receiver(post_save, sender=Category)
+def queue_category_thumbnails(sender, instance, **kwargs):
+    if instance.cat_image:
+        thumbnails.lookup(instance.cat_image.name)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    # Search documents carry the category name, so a rename must reach them
+    if created or not search.supported():
+        return
+
+    def reindex():
+        ids = list(Product.objects.filter(category_id=instance.pk).values_list('id', flat=True))
+        for start in range(0, len(ids), REINDEX_BATCH_SIZE):
+            search.index_products(ids[start:start + REINDEX_BATCH_SIZE])
+
+    transaction.on_commit(reindex)
@@ -1,3 +1,30 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from chuefamily.cache import bump_version, pinned_versions
+from .context_processors import get_menu_links
+from .models import Category
+
+
+class MenuLinksTests(TestCase):
+    """Run against the configured (database) cache, as deployed without Redis."""
+
+    def setUp(self):
+        cache.clear()
+        Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+
+    def test_warm_menu_only_reads_the_pinned_versions(self):
+        with pinned_versions():
+            get_menu_links()
+        with pinned_versions():
+            # the request's single read of the cache versions, shared with the page
+            with self.assertNumQueries(1):
+                links = get_menu_links()
+                self.assertIs(get_menu_links(), links)
+        self.assertEqual([link['slug'] for link in links], ['footwear'])
+
+    def test_category_change_rebuilds_the_menu(self):
+        get_menu_links()
+        Category.objects.create(category_name='Bags', slug='bags', sku_prefix='BG')
+        bump_version('category')  # category.signals does this on commit
+        self.assertEqual([link['slug'] for link in get_menu_links()], ['footwear', 'bags'])
@@ -0,0 +1,89 @@
+"""
+Namespace versions for cache invalidation.
+
+Entries are cached under versioned_key(namespace, ...), and a write bumps
+the namespace's version instead of deleting them. The version lives in the
+default cache, so a bump only reaches other web workers and management
+commands when that cache is shared between processes (Redis or the
+database cache, see CACHES in settings); with a per-process LocMemCache
+each process would keep serving its own stale entries.
+
+Inside a request (see PinnedVersionsMiddleware) the versions are read once,
+all namespaces in a single get_many, and then pinned until the response is
+returned: with the database cache every get_version would otherwise be a
+query of its own.
+"""
+import time
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.core.cache import cache
+
+# Every namespace bumped somewhere, fetched together on a request's first read
+NAMESPACES = ('catalog', 'category', 'stock', 'thumbs', 'groups')
+
+_pinned = Local()
+
+
+def _fetch_versions(namespaces):
+    keys = {f'version:{namespace}': namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    versions = {}
+    for key, namespace in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[namespace] = version
+    return versions
+
+
+def get_version(namespace):
+    """
+    Current version token of a cache namespace.
+
+    Versions are timestamps rather than counters so that an evicted version
+    key can never come back as an old value and resurrect stale entries.
+    """
+    versions = getattr(_pinned, 'versions', None)
+    if versions is None:
+        return _fetch_versions([namespace])[namespace]
+    if namespace not in versions:
+        versions.update(_fetch_versions(NAMESPACES if not versions else [namespace]))
+    return versions[namespace]
+
+
+def bump_version(namespace):
+    """Invalidate everything cached under namespace."""
+    version = time.time_ns()
+    cache.set(f'version:{namespace}', version, None)
+    versions = getattr(_pinned, 'versions', None)
+    if versions is not None:
+        versions[namespace] = version
+
+
+def versioned_key(namespace, *parts):
+    return ':'.join(str(p) for p in (namespace, get_version(namespace), *parts))
+
+
+@contextmanager
+def pinned_versions():
+    """Read each namespace's version at most once until the block exits."""
+    previous = getattr(_pinned, 'versions', None)
+    _pinned.versions = {} if previous is None else previous
+    try:
+        yield
+    finally:
+        _pinned.versions = previous
+
+
+class PinnedVersionsMiddleware:
+    """Pin the cache versions for the duration of each request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with pinned_versions():
+            return self.get_response(request)
@@ -40,17 +40,20 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     'django.contrib.humanize', # Add this line
     'admin_honeypot',
+    "rest_framework",
     "qrcode",
     "warehouse",
     "category",
     "accounts",
     "store",
+    "api",
     
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "chuefamily.cache.PinnedVersionsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -74,6 +77,26 @@ DATABASES = {
     }
 }
 
+# Cache shared by every web worker and management command. The namespace
+# versions in chuefamily.cache are how a write in one process invalidates
+# what the others cached, so it must not be per-process (LocMemCache).
+# Set REDIS_URL in production (needs the redis package); the database
+# fallback's table is created by `migrate` (store migration 0012).
+if config("REDIS_URL", default=""):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": config("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_cache",
+        }
+    }
+
 STATIC_URL = "/static/"
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -160,6 +183,29 @@ LOCALE_PATHS = [BASE_DIR / "locale"]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Seconds a reverse proxy may serve a public storefront page without revalidating
+STORE_CACHE_MAX_AGE = config("STORE_CACHE_MAX_AGE", default=60, cast=int)
+
+# Number of newest products on the homepage
+HOME_FEED_SIZE = config("HOME_FEED_SIZE", default=12, cast=int)
+
+# Background threads rendering product QR codes (0 = render inline on commit)
+QR_CODE_WORKERS = config("QR_CODE_WORKERS", default=2, cast=int)
+
+# Background threads rendering image thumbnails (0 = render inline on commit)
+THUMBNAIL_WORKERS = config("THUMBNAIL_WORKERS", default=2, cast=int)
+
+# JSON API for scanners and POS terminals (api app)
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
+    "DEFAULT_PERMISSION_CLASSES": ["api.permissions.IsWarehouseStaff"],
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.CreatedCursorPagination",
+    "PAGE_SIZE": 50,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -171,6 +217,9 @@ MESSAGE_TAGS= {
 }
 
 STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     }
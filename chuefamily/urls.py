@@ -30,6 +30,7 @@ urlpatterns = [
     path("store/", include('store.urls')),
     path("accounts/", include('accounts.urls')),
     path("warehouse/", include('warehouse.urls')),
+    path("api/", include('api.urls')),
 
     # for languages
     path("i18n/", include('django.conf.urls.i18n')), # for language setup
@@ -1,9 +1,87 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language, override
+from chuefamily.cache import get_version
+from store.caching import catalog_conditional
+from store import thumbnails
 from store.models import Product
 
-def home(request): 
-    product = Product.objects.all().filter(is_available=True)
+# Lifetime of a rendered feed; normally replaced long before by a catalog change
+HOME_FEED_TIMEOUT = 60 * 60 * 24
+
+# Per-process copy of each language's current feed: no cache read per visit
+_local = {}
+
+
+@catalog_conditional
+def home(request):
+    feed_html, fresh = get_home_feed()
     context = {
-        'product': product,
+        'feed_html': mark_safe(feed_html),
     }
-    return render(request, 'home.html', context)
\ No newline at end of file
+    response = render(request, 'home.html', context)
+    # The validators describe the current versions, not the ones this feed was built from
+    response.catalog_stale = not fresh
+    return response
+
+
+def get_home_feed():
+    """
+    (html, fresh) of the homepage product feed: the HOME_FEED_SIZE newest
+    products, and whether it reflects the current versions.
+
+    The fragment is cached with the catalog and thumbnail versions it was
+    built from. Once either changes, visitors keep getting the previous
+    fragment while a background thread renders the new one, so the page
+    never waits on it.
+    """
+    language = get_language()
+    # Rebuilt when the products change or their thumbnails become available
+    catalog, thumbs = get_version('catalog'), get_version('thumbs')
+    # A plain string, as it goes into the rebuild lock's cache key
+    version = f'{catalog}.{thumbs}'
+    entry = _local.get(language)
+    if entry is not None and entry[0] == version:
+        return entry[1], True
+
+    entry = cache.get(f'home-feed:{language}')
+    if entry is None:
+        return _build_home_feed(language, version), True
+
+    built_version, html = entry
+    if built_version == version:
+        _local[language] = entry
+    elif cache.add(f'home-feed-rebuild:{language}:{version}', True, 60):
+        threading.Thread(target=_rebuild_home_feed, args=(language, version), daemon=True).start()
+    return html, built_version == version
+
+
+def _build_home_feed(language, version):
+    products = list(
+        Product.objects.with_urls()
+        .filter(is_available=True)
+        .order_by('-created_at')[:settings.HOME_FEED_SIZE]
+    )
+    context = {
+        'products': products,
+        'thumbnail_manifests': thumbnails.lookup_many(p.images.name for p in products),
+    }
+    with override(language):
+        html = render_to_string('includes/home_feed.html', context)
+    entry = (version, str(html))
+    cache.set(f'home-feed:{language}', entry, HOME_FEED_TIMEOUT)
+    _local[language] = entry
+    return html
+
+
+def _rebuild_home_feed(language, version):
+    try:
+        _build_home_feed(language, version)
+    finally:
+        close_old_connections()
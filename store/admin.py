@@ -1,12 +1,13 @@
-from django.contrib import admin
-from .models import Product, Variation, StockMovement
+from django.contrib import admin, messages
+from .models import Product, Variation, StockMovement, Supplier, SupplierInvoice, SupplierInvoiceItem
+from warehouse.services import post_invoice
 # Register your models here.
 
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('product_name', 'price','stock','category','modified_date','is_available')
     exclude = ('sku',)
     prepopulated_fields = {'slug':('product_name',)}
-    readonly_fields = ('qr_code',)
+    readonly_fields = ('qr_code', 'total_in', 'total_out')
     
 
 class VariationAdmin(admin.ModelAdmin):
@@ -15,7 +16,31 @@ class VariationAdmin(admin.ModelAdmin):
     list_filter = ('product','variation_category','variation_value')
     
 
+class SupplierInvoiceItemInline(admin.TabularInline):
+    model = SupplierInvoiceItem
+    raw_id_fields = ('product',)
+    extra = 1
+
+
+class SupplierInvoiceAdmin(admin.ModelAdmin):
+    list_display = ('inv_no', 'supplier', 'status', 'posted_at')
+    list_filter = ('status',)
+    readonly_fields = ('status', 'posted_at')
+    inlines = [SupplierInvoiceItemInline]
+    actions = ['post_selected']
+
+    @admin.action(description='Post selected invoices to stock')
+    def post_selected(self, request, queryset):
+        posted = 0
+        for invoice in queryset.filter(status=SupplierInvoice.DRAFT):
+            post_invoice(invoice, posted_by=request.user)
+            if invoice.status == SupplierInvoice.POSTED:
+                posted += 1
+        self.message_user(request, f'{posted} invoice(s) posted.', messages.SUCCESS)
+
 
 admin.site.register(Product, ProductAdmin)
 admin.site.register(Variation, VariationAdmin)
-admin.site.register(StockMovement)
\ No newline at end of file
+admin.site.register(StockMovement)
+admin.site.register(Supplier)
+admin.site.register(SupplierInvoice, SupplierInvoiceAdmin)
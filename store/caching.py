@@ -0,0 +1,82 @@
+"""
+Conditional GET and cache headers for the storefront pages.
+
+A page is a function of the catalog, category, stock and thumbnail cache
+versions, the language, the visitor's cookies and the URL. All of those are
+known without touching the database, so a revisit whose ETag still matches
+is answered 304 before the view runs a single query. The versions are
+time_ns() tokens of the last change, which doubles as Last-Modified.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+from chuefamily.cache import get_version
+
+# Cache versions bumped by product/variation saves, category signals, stock
+# postings and newly generated thumbnails
+NAMESPACES = ('catalog', 'category', 'stock', 'thumbs')
+
+# Cookies that make a page specific to one visitor
+PERSONAL_COOKIES = (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME, 'messages')
+
+
+def _validators(request):
+    """(etag, last_modified) of the current request, computed once."""
+    if not hasattr(request, '_catalog_validators'):
+        versions = [get_version(namespace) for namespace in NAMESPACES]
+        cookies = [request.COOKIES.get(name, '') for name in PERSONAL_COOKIES]
+        raw = '|'.join(map(str, [*versions, get_language(), *cookies, request.get_full_path()]))
+        etag = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+        last_modified = datetime.fromtimestamp(max(versions) / 1e9, tz=timezone.utc)
+        request._catalog_validators = (etag, last_modified)
+    return request._catalog_validators
+
+
+def catalog_conditional(view):
+    """
+    Serve view with catalog-version ETag/Last-Modified and proxy-friendly headers.
+
+    Responses to cookie-less requests that set no cookies are public and may
+    be held by a reverse proxy for STORE_CACHE_MAX_AGE seconds; anything tied
+    to a visitor is private. Either way browsers revalidate every time. A
+    view that serves content older than the current versions sets
+    response.catalog_stale, and gets no validators and no proxy caching.
+    """
+    conditional = condition(
+        etag_func=lambda request, *args, **kwargs: _validators(request)[0],
+        last_modified_func=lambda request, *args, **kwargs: _validators(request)[1],
+    )(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        personal = (
+            any(name in request.COOKIES for name in PERSONAL_COOKIES)
+            or response.cookies
+            # {% csrf_token %} was rendered: the CSRF middleware will set a cookie
+            or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        )
+        if getattr(response, 'catalog_stale', False):
+            # Built from older versions than the validators describe: a
+            # revisit with this ETag would be told it is current for good
+            del response.headers['ETag']
+            del response.headers['Last-Modified']
+            patch_cache_control(response, no_cache=True, max_age=0)
+        elif personal:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=0, s_maxage=settings.STORE_CACHE_MAX_AGE,
+            )
+        patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+        return response
+
+    return wrapper
@@ -0,0 +1,193 @@
+"""
+In-memory facet index for the store listing.
+
+A FacetIndex holds the available products of one category (or all of
+them) newest first, and one bitmap per facet value: bit i is set when the
+product at position i has that size, color or price bucket. Filtering is
+AND/OR over Python ints and every facet count is one popcount, so a
+listing request needs no queries beyond fetching the visible page.
+
+Indexes are cached under the "catalog" cache version, which Product and
+Variation bump whenever they change.
+"""
+import re
+from bisect import bisect_left, bisect_right
+
+from django.core.cache import cache
+
+from chuefamily.cache import get_version
+
+from .models import Product, Variation
+
+FACETS = ('size', 'color')
+PRICE_BUCKETS = 5
+FACET_CACHE_TIMEOUT = 60 * 60
+
+# Per-process copies for the current catalog version, so a hit does not even
+# pay for unpickling: {version: {category_id or 'all': index}}
+_local = {}
+
+
+def build_price_ranges(min_p, max_p, buckets=PRICE_BUCKETS):
+    """
+    Return list of dicts:
+    [{'min': 100, 'max': 180}, ...] length=buckets
+
+    Uses equal-width ranges. Handles edge cases (min==max, None).
+    """
+    if min_p is None or max_p is None:
+        return []
+    min_p = int(min_p)
+    max_p = int(max_p)
+
+    if min_p >= max_p:
+        #All products are the same prices --> one range
+        return [{
+            'min': min_p,
+            'max': max_p,
+            }]
+    span = max_p - min_p
+    step = max(1, span // buckets) #avoid zero step
+
+    ranges = []
+    start = min_p
+    for i in range(buckets):
+        end = start + step
+        if i == buckets -1:
+            end = max_p
+        ranges.append({
+            'min': start,
+            'max': end,
+        })
+        start = end + 1
+
+        if start > max_p:
+            break
+    return ranges
+
+
+def _bitmap(positions, size):
+    buf = bytearray((size + 7) // 8)
+    for pos in positions:
+        buf[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _positions(bitmap):
+    return [m.start() for m in re.finditer('1', bin(bitmap)[:1:-1])]
+
+
+class FacetIndex:
+
+    def __init__(self, product_ids, prices, facet_positions):
+        self.product_ids = product_ids
+        size = len(product_ids)
+        self.all = (1 << size) - 1
+
+        order = sorted(range(size), key=prices.__getitem__)
+        self._sorted_prices = [prices[pos] for pos in order]
+        self._price_positions = order
+        self.min_price = self._sorted_prices[0] if size else None
+        self.max_price = self._sorted_prices[-1] if size else None
+
+        self.bitmaps = {
+            facet: {
+                value: _bitmap(positions, size)
+                for value, positions in sorted(facet_positions.get(facet, {}).items())
+            }
+            for facet in FACETS
+        }
+        self.price_ranges = [
+            dict(r, bitmap=self.price_bitmap(r['min'], r['max']))
+            for r in build_price_ranges(self.min_price, self.max_price)
+        ]
+
+    @classmethod
+    def build(cls, category_id=None):
+        products = Product.objects.filter(is_available=True)
+        if category_id:
+            products = products.filter(category_id=category_id)
+        rows = list(products.order_by('-created_at', '-id').values_list('id', 'price'))
+        position = {pk: i for i, (pk, _) in enumerate(rows)}
+
+        facet_positions = {}
+        variations = (
+            Variation.objects
+            .filter(is_active=True, variation_category__in=FACETS, product__in=products)
+            .values_list('product_id', 'variation_category', 'variation_value')
+        )
+        for product_id, facet, value in variations:
+            facet_positions.setdefault(facet, {}).setdefault(value, set()).add(position[product_id])
+
+        return cls([pk for pk, _ in rows], [price for _, price in rows], facet_positions)
+
+    def price_bitmap(self, min_price=None, max_price=None):
+        lo = 0 if min_price is None else bisect_left(self._sorted_prices, min_price)
+        hi = len(self._sorted_prices) if max_price is None else bisect_right(self._sorted_prices, max_price)
+        if lo == 0 and hi == len(self._sorted_prices):
+            return self.all
+        return _bitmap(self._price_positions[lo:hi], len(self.product_ids))
+
+    def query(self, selected=None, min_price=None, max_price=None):
+        """
+        Products matching the selection plus counts for every facet value.
+
+        selected maps a facet to the values picked for it (OR within a facet,
+        AND across facets). Each facet is counted against the other facets'
+        filters only, so picking one size still shows the alternatives.
+        """
+        filters = {}
+        for facet, values in (selected or {}).items():
+            if values:
+                bitmaps = self.bitmaps.get(facet, {})
+                filters[facet] = 0
+                for value in values:
+                    filters[facet] |= bitmaps.get(value, 0)
+        if min_price is not None or max_price is not None:
+            filters['price'] = self.price_bitmap(min_price, max_price)
+
+        def matching(exclude=None):
+            bitmap = self.all
+            for name, value in filters.items():
+                if name != exclude:
+                    bitmap &= value
+            return bitmap
+
+        counts = {}
+        for facet in FACETS:
+            base = matching(exclude=facet)
+            counts[facet] = {
+                value: (bitmap & base).bit_count()
+                for value, bitmap in self.bitmaps[facet].items()
+            }
+        base = matching(exclude='price')
+        price_ranges = [
+            {'min': r['min'], 'max': r['max'], 'count': (r['bitmap'] & base).bit_count()}
+            for r in self.price_ranges
+        ]
+
+        result = matching()
+        return {
+            'product_ids': [self.product_ids[pos] for pos in _positions(result)],
+            'counts': counts,
+            'price_ranges': price_ranges,
+        }
+
+
+def get_index(category_id=None):
+    version = get_version('catalog')
+    indexes = _local.get(version)
+    if indexes is None:
+        # A new catalog version: every index built from an older one is stale
+        _local.clear()
+        indexes = _local.setdefault(version, {})
+    name = category_id or 'all'
+    index = indexes.get(name)
+    if index is None:
+        key = f'catalog:{version}:facets:{name}'
+        index = cache.get(key)
+        if index is None:
+            index = FacetIndex.build(category_id)
+            cache.set(key, index, FACET_CACHE_TIMEOUT)
+        indexes[name] = index
+    return index
@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from category.models import Category
+from store import search
+from store.models import Product
+
+ADJECTIVES = ['classic', 'sport', 'leather', 'canvas', 'summer', 'winter', 'kids', 'comfort',
+              'running', 'casual', 'formal', 'slip', 'trail', 'retro', 'light', 'premium']
+NOUNS = ['sneaker', 'sandal', 'boot', 'loafer', 'slipper', 'heel', 'flat', 'clog',
+         'trainer', 'moccasin', 'oxford', 'mule', 'espadrille', 'wedge', 'derby', 'brogue']
+COLORS = ['black', 'white', 'red', 'blue', 'brown', 'tan', 'grey', 'green', 'pink', 'navy']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic catalog and report p50/p95 latency of ranked full-text "
+        "search against the old icontains query. Run it against a scratch "
+        "database: it inserts --products products."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--baseline-queries', type=int, default=20,
+                            help='icontains is slow at scale, so sample fewer of those')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic rows afterwards')
+
+    def handle(self, *args, **options):
+        if not search.supported():
+            raise CommandError('Full-text search needs SQLite (FTS5) or PostgreSQL.')
+
+        category = self._seed(options)
+        rng = random.Random(7)
+        vocabulary = ADJECTIVES + NOUNS + COLORS
+        keywords = [
+            ' '.join(rng.sample(vocabulary, rng.choice((1, 2))))[:rng.choice((3, 5, 20))].strip()
+            for _ in range(options['queries'])
+        ]
+
+        def fts(keyword):
+            ids = search.search_ids(keyword)
+            dict(Product.objects.in_bulk(ids[:6]))
+
+        def icontains(keyword):
+            qs = Product.objects.filter(is_available=True).filter(
+                Q(product_name__icontains=keyword) | Q(description__icontains=keyword)
+            ).order_by('-created_at')
+            qs.count()
+            list(qs[:6])
+
+        for label, func, sample in (
+            ('full-text index', fts, keywords),
+            ('icontains (before)', icontains, keywords[:options['baseline_queries']]),
+        ):
+            samples = self._time(func, sample)
+            self.stdout.write(
+                f'{label}: {len(samples)} queries, p50 {statistics.median(samples):.1f} ms, '
+                f'p95 {self._p95(samples):.1f} ms, max {max(samples):.1f} ms'
+            )
+
+        if not options['keep']:
+            with transaction.atomic():
+                Product.objects.filter(category=category).delete()
+                category.delete()
+                search.rebuild_index()
+
+    def _time(self, func, keywords):
+        samples = []
+        for keyword in keywords:
+            started = time.perf_counter()
+            func(keyword)
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def _p95(self, samples):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def _seed(self, options):
+        tag = time.time_ns()
+        category = Category.objects.create(
+            category_name=f'Bench Search {tag}', slug=f'bench-search-{tag}', sku_prefix=f'BENCHSRCH{tag}',
+        )
+
+        # Raw executemany: Product.save renders a QR code per row
+        table = Product._meta.db_table
+        columns = ('sku', 'product_name', 'slug', 'description', 'price', 'images', 'stock',
+                   'total_in', 'total_out', 'is_available', 'category_id', 'created_at',
+                   'modified_date', 'qr_code')
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(table),
+            ', '.join(connection.ops.quote_name(c) for c in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+
+        rng = random.Random(42)
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        batch = 50_000
+        started = time.perf_counter()
+        for offset in range(0, options['products'], batch):
+            rows = []
+            for i in range(offset, min(offset + batch, options['products'])):
+                name = f'{rng.choice(ADJECTIVES)} {rng.choice(COLORS)} {rng.choice(NOUNS)} {tag}-{i}'
+                rows.append((
+                    f'BENCHSRCH-{tag}-{i}', name, f'bench-search-{tag}-{i}',
+                    f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} in {rng.choice(COLORS)}',
+                    rng.randint(100, 5000), '', 0, 0, 0, True, category.pk, now, now, '',
+                ))
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+        self.stdout.write(f"Seeded {options['products']} products in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        search.rebuild_index()
+        self.stdout.write(f'Built the search index in {time.perf_counter() - started:.1f}s')
+        return category
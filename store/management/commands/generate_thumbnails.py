@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from category.models import Category
+from chuefamily.cache import bump_version
+from store import thumbnails
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the srcset variants of product and category images that have "
+        "none yet. Resizing runs on --parallel worker processes; files are "
+        "read and written from this process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parallel', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes resizing images (default: all cores)')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--all', action='store_true', help='Regenerate every variant')
+
+    def handle(self, *args, **options):
+        names = set(Product.objects.exclude(images='').values_list('images', flat=True))
+        names.update(Category.objects.exclude(cat_image='').values_list('cat_image', flat=True))
+        names = sorted(name for name in names if default_storage.exists(name))
+        if not options['all']:
+            # load_manifest() also warms the cache for images that are done
+            names = [name for name in names if thumbnails.load_manifest(name) is None]
+
+        total = len(names)
+        if not total:
+            self.stdout.write('Every image already has thumbnails.')
+            return
+
+        started = time.perf_counter()
+        done = failed = 0
+        batch_size = options['batch_size']
+        with ProcessPoolExecutor(max_workers=max(1, options['parallel'])) as pool:
+            for offset in range(0, total, batch_size):
+                batch = names[offset:offset + batch_size]
+                futures = []
+                for name in batch:
+                    with default_storage.open(name) as handle:
+                        futures.append(pool.submit(thumbnails.render_variants, handle.read()))
+                for name, future in zip(batch, futures):
+                    try:
+                        thumbnails.store_variants(name, *future.result())
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(f'{name}: {exc}')
+                done += len(batch)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{done}/{total} images, {done / elapsed:.0f}/s')
+
+        # pages rendered without srcset are stale now
+        bump_version('thumbs')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated thumbnails for {total - failed} images in {elapsed:.2f}s '
+            f'({total / elapsed:.0f}/s on {options["parallel"]} processes)'
+        ))
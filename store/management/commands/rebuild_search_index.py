@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text product search index from the catalog."
+
+    def handle(self, *args, **options):
+        if not search.supported():
+            raise CommandError('Full-text search needs SQLite (FTS5) or PostgreSQL.')
+        started = time.perf_counter()
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the search index in {time.perf_counter() - started:.2f}s'
+        ))
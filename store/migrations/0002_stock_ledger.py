@@ -0,0 +1,54 @@
+# Generated by Django 5.2.11 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Rebuild running balances from the existing history.
+
+    The opening balance is whatever product.stock held before the first
+    recorded movement, so we walk forward from (stock - net movements).
+    """
+    Product = apps.get_model("store", "Product")
+    StockMovement = apps.get_model("store", "StockMovement")
+
+    for product in Product.objects.all().iterator():
+        movements = list(
+            StockMovement.objects.filter(product=product).order_by("created_at", "id")
+        )
+        total_in = sum(m.quantity for m in movements if m.movement_type == "IN")
+        total_out = sum(m.quantity for m in movements if m.movement_type == "OUT")
+
+        running = product.stock - (total_in - total_out)
+        for m in movements:
+            running += m.quantity if m.movement_type == "IN" else -m.quantity
+            m.balance_after = running
+        StockMovement.objects.bulk_update(movements, ["balance_after"], batch_size=1000)
+
+        Product.objects.filter(pk=product.pk).update(total_in=total_in, total_out=total_out)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="total_in",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="total_out",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="stockmovement",
+            name="balance_after",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.11 on 2026-10-17 00:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_summary(apps, schema_editor):
+    StockMovement = apps.get_model("store", "StockMovement")
+    StockDailySummary = apps.get_model("store", "StockDailySummary")
+
+    rows = {}
+    movements = StockMovement.objects.order_by("product_id", "created_at", "id").values_list(
+        "product_id", "created_at", "movement_type", "quantity", "unit_price", "balance_after"
+    )
+    for product_id, created_at, movement_type, quantity, unit_price, balance_after in movements.iterator():
+        key = (product_id, timezone.localdate(created_at))
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = StockDailySummary(product_id=product_id, day=key[1])
+        if movement_type == "IN":
+            row.qty_in += quantity
+            row.value_in += quantity * unit_price
+        else:
+            row.qty_out += quantity
+            row.income += quantity * unit_price
+        row.closing_balance = balance_after
+
+    StockDailySummary.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0002_stock_ledger"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockDailySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("qty_in", models.PositiveIntegerField(default=0)),
+                ("qty_out", models.PositiveIntegerField(default=0)),
+                ("value_in", models.BigIntegerField(default=0)),
+                ("income", models.BigIntegerField(default=0)),
+                ("closing_balance", models.IntegerField(default=0)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_summaries",
+                        to="store.product",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["day"], name="stock_summary_day_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "day"), name="unique_product_day_summary"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
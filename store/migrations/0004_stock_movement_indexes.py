@@ -0,0 +1,26 @@
+# Generated by Django 5.2.11 on 2026-10-17 00:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0003_stock_daily_summary"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["movement_type", "created_at"], name="movement_type_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["product", "created_at"], name="movement_product_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-17 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0004_stock_movement_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["created_at", "id"], name="movement_created_id_idx"
+            ),
+        ),
+    ]
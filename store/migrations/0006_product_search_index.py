@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from store import search
+
+
+def create_index(apps, schema_editor):
+    if search.supported(schema_editor.connection):
+        search.install(schema_editor.connection)
+        search.rebuild_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    if search.supported(schema_editor.connection):
+        search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0005_stock_movement_keyset_index"),
+        ("category", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-17 00:52
+
+from django.db import migrations
+
+# Only PostgreSQL has pattern operator classes; elsewhere a LIKE prefix
+# cannot use such an index, and warehouse.utils.sku_prefix_filter turns
+# prefixes into ranges on the unique sku index instead.
+INDEX_NAME = "product_sku_prefix_idx"
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON store_product (sku varchar_pattern_ops)"
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("category", "0001_initial"),
+        ("store", "0006_product_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.11 on 2026-10-17 01:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from store.sku import category_prefix, next_number
+
+
+def seed_sequences(apps, schema_editor):
+    """Start every category after the SKUs it already has (PREFIX-<product id>)."""
+    Category = apps.get_model("category", "Category")
+    Product = apps.get_model("store", "Product")
+    SkuSequence = apps.get_model("store", "SkuSequence")
+
+    sequences = []
+    for category in Category.objects.all():
+        prefix = category_prefix(category.sku_prefix, category.category_name)
+        skus = Product.objects.filter(sku__startswith=f"{prefix}-").values_list("sku", flat=True)
+        sequences.append(SkuSequence(category=category, next_value=next_number(skus.iterator(), prefix)))
+    SkuSequence.objects.bulk_create(sequences)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("category", "0001_initial"),
+        ("store", "0007_product_sku_prefix_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SkuSequence",
+            fields=[
+                (
+                    "category",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="sku_sequence",
+                        serialize=False,
+                        to="category.category",
+                    ),
+                ),
+                ("next_value", models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.11 on 2026-10-17 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("category", "0001_initial"),
+        ("store", "0008_sku_sequence"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["is_available", "-created_at"],
+                name="product_available_created_idx",
+            ),
+        ),
+    ]
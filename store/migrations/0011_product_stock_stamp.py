@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0010_stock_movement_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="stock_stamp",
+            field=models.BigIntegerField(
+                db_default=0, db_index=True, default=0, editable=False
+            ),
+        ),
+    ]
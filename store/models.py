@@ -1,12 +1,87 @@
 from django.db import models
 from category.models import Category
-from django.urls import reverse
-import qrcode
-from io import BytesIO
-from django.core.files import File
-from django.db.models import Max
+from django.urls import get_script_prefix, reverse
+from functools import lru_cache
+from django.db import connection, transaction
+from django.utils import timezone
+from django.db.models import F, Max
+from django.db.models.expressions import RawSQL
+from chuefamily.cache import bump_version
+from . import qr, search, sku, thumbnails
 # Create your models here.
 
+def bump_catalog_version():
+    """Invalidate catalog caches (facet indexes) once the change is committed."""
+    transaction.on_commit(lambda: bump_version('catalog'))
+
+
+def stock_change_stamp():
+    """
+    Value for Product.stock_stamp in a write that changes stock: the
+    transaction id on PostgreSQL, else the next counter value, which SQLite's
+    single writer keeps in commit order. See warehouse.sync.
+    """
+    if connection.vendor == 'postgresql':
+        return RawSQL('pg_current_xact_id()::text::bigint', ())
+    table = connection.ops.quote_name(Product._meta.db_table)
+    return RawSQL(f'(SELECT COALESCE(MAX(stock_stamp), 0) + 1 FROM {table})', ())
+
+
+@lru_cache(maxsize=8)
+def _product_url_parts(script_prefix):
+    # reverse() once with placeholder slugs and keep the text around them
+    url = reverse('product_detail', args=['category-slug', 'product-slug'])
+    head, _, rest = url.partition('category-slug')
+    middle, _, tail = rest.partition('product-slug')
+    return head, middle, tail
+
+
+def product_url(category_slug, product_slug):
+    """Same as reverse('product_detail', ...) but plain string formatting."""
+    head, middle, tail = _product_url_parts(get_script_prefix())
+    return f'{head}{category_slug}{middle}{product_slug}{tail}'
+
+
+class ProductManager(models.Manager):
+    def with_urls(self):
+        """Products carrying category_slug, so get_url() needs no extra query."""
+        return self.annotate(category_slug=F('category__slug'))
+
+    def create_many(self, products, batch_size=1000, qr_codes=True):
+        """
+        Insert many new products in a handful of statements.
+
+        Products without a SKU get one from a block reserved per category,
+        then everything goes in with bulk_create. Search documents, QR codes
+        and the catalog version are handled once for the whole batch instead
+        of per row as Product.save does. qr_codes=False skips rendering QR
+        codes, for throwaway products such as benchmark data.
+        """
+        products = list(products)
+        missing = {}
+        for product in products:
+            if not product.sku:
+                missing.setdefault(product.category_id, []).append(product)
+
+        with transaction.atomic():
+            for category_id, group in missing.items():
+                for product, value in zip(group, sku.allocate(category_id, len(group))):
+                    product.sku = value
+            created = self.bulk_create(products, batch_size=batch_size)
+
+            ids = [product.pk for product in created if product.pk is not None]
+            if ids:
+                # opening stock reaches syncing devices like any other change
+                self.filter(pk__in=ids).update(stock_stamp=stock_change_stamp())
+                if search.supported():
+                    search.index_products(ids)
+                if qr_codes:
+                    qr.schedule_many([product.pk for product in created if product.pk and not product.qr_code])
+                thumbnails.schedule_many([product.images.name for product in created if product.images])
+            bump_catalog_version()
+        return created
+
+
 class Product(models.Model):
     sku = models.CharField(max_length=50, unique=True, blank=True)
     product_name = models.CharField(max_length=200, unique=True)
@@ -15,6 +90,11 @@ class Product(models.Model):
     price = models.IntegerField()
     images = models.ImageField(upload_to='photos/products/', blank=True)
     stock = models.IntegerField()
+    # Cumulative ledger totals, maintained by warehouse.services on every posting
+    total_in = models.PositiveIntegerField(default=0)
+    total_out = models.PositiveIntegerField(default=0)
+    # Commit-ordered stamp of the last stock change, see warehouse.sync
+    stock_stamp = models.BigIntegerField(default=0, db_default=0, db_index=True, editable=False)
     is_available = models.BooleanField(default=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -22,8 +102,25 @@ class Product(models.Model):
 
     qr_code = models.ImageField(upload_to='photos/qr/', blank=True, null=True)
 
+    objects = ProductManager()
+
+    class Meta:
+        indexes = [
+            # SKU prefix lookups (LIKE 'FW-000%') use product_sku_prefix_idx, a
+            # varchar_pattern_ops index that migration 0007 creates on
+            # PostgreSQL only; other backends search prefixes as sku ranges
+            # newest available products (homepage feed, listings)
+            models.Index(fields=['is_available', '-created_at'], name='product_available_created_idx'),
+        ]
+
     def get_url(self):
-        return reverse('product_detail', args=[self.category.slug, self.slug])
+        # Listings load category_slug with ProductManager.with_urls(), so
+        # there is neither a category fetch nor a reverse() per card
+        url = self.__dict__.get('_url')
+        if url is None:
+            category_slug = self.__dict__.get('category_slug') or self.category.slug
+            url = self._url = product_url(category_slug, self.slug)
+        return url
     def __str__(self):
         return self.product_name
     
@@ -32,57 +129,58 @@ class Product(models.Model):
     
     def generate_sku(self):
         """
-        Generate unique SKU based on category prefix + ID
+        Allocate the next SKU of the product's category sequence
         Example: FW-00012
         """
-        prefix = (
-            getattr(self.category, "sku_prefix", None)
-            or self.category.category_name[:2]
-        ).upper()
-
-        return f"{prefix}-{str(self.id).zfill(5)}"
+        return sku.allocate(self.category_id)[0]
 
     def generate_qr(self):
         """
         Generate QR image encoding ONLY SKU
         """
-        qr_data = f"CHUE|{self.sku}"
-
-        qr = qrcode.QRCode(
-            version=1,
-            box_size=10,
-            border=4,
-        )
-
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
+        self.qr_code.name = qr.store_qr_png(self, qr.render_qr_png(self.sku))
 
-        self.qr_code.save(
-            f"{self.sku}.png",
-            File(buffer),
-            save=False
-        )
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # stock as loaded, so save() can tell an edit of it
+        instance._loaded_stock = instance.__dict__.get('stock')
+        return instance
 
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
+        # SKU comes from the category sequence, so a new product is one INSERT
+        if self.pk is None and not self.sku:
+            self.sku = self.generate_sku()
 
-        # First save to get ID
+        update_fields = kwargs.get('update_fields')
+        stock_changed = (
+            'stock' in self.__dict__
+            and (update_fields is None or 'stock' in update_fields)
+            and (self._state.adding or self.stock != getattr(self, '_loaded_stock', None))
+        )
         super().save(*args, **kwargs)
 
-        # If new object and SKU not set → generate SKU
-        if is_new and not self.sku:
-            self.sku = self.generate_sku()
-            super().save(update_fields=["sku"])
+        # Opening stock and stock edited by hand (admin) bypass warehouse.services
+        if stock_changed:
+            Product.objects.filter(pk=self.pk).update(stock_stamp=stock_change_stamp())
+            self._loaded_stock = self.stock
 
-        # Generate QR if missing
+        # QR image is rendered in the background once the row is committed
         if self.sku and not self.qr_code:
-            self.generate_qr()
-            super().save(update_fields=["qr_code"])
+            qr.schedule(self.pk)
+        # so are the srcset variants of the photo, unless they already exist
+        if self.images:
+            thumbnails.lookup(self.images.name)
+
+        # Keep the full-text search document in step with the row
+        if search.supported():
+            search.index_product(self.pk)
+        bump_catalog_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_catalog_version()
+        return result
 
     @property
     def total_value(self):
@@ -103,6 +201,9 @@ class VariationManager(models.Manager):
         return super(VariationManager, self).filter(variation_category='color', is_active=True)
     def sizes(self):
         return super(VariationManager, self).filter(variation_category='size', is_active=True)
+    def options(self):
+        # active colors and sizes together, for a single prefetch
+        return super(VariationManager, self).filter(variation_category__in=('color', 'size'), is_active=True)
     
 variation_category_choice = (
     ('color', 'color'),
@@ -121,6 +222,22 @@ class Variation(models.Model):
     def __str__(self):
         return self.variation_value 
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._product_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._product_changed()
+        return result
+
+    def _product_changed(self):
+        # The product page shows variations, so they count as a product change
+        Product.objects.filter(pk=self.product_id).update(modified_date=timezone.now())
+        if search.supported():
+            search.index_product(self.product_id)
+        bump_catalog_version()
+
 
     
 # for Warehouse
@@ -142,23 +259,86 @@ class StockMovement(models.Model):
         ('CUS_REQ', 'Customer Requisition'),
         ('ADJ', 'Adjustment'),
     )
+    # Which reference documents may cause each kind of movement
+    ALLOWED_REF_TYPES = {
+        IN: {'SUP_INV', 'SUP_REQ', 'ADJ'},
+        OUT: {'CUS_INV', 'CUS_REQ', 'ADJ'},
+    }
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     movement_type = models.CharField(max_length=3, choices=MOVEMENT_TYPES)
     # Snapshot of unit price at the time of movement (product price may change later)
     unit_price = models.IntegerField(default=0)
     quantity = models.PositiveIntegerField()
+    # Running balance of product.stock right after this movement was posted
+    balance_after = models.IntegerField(default=0)
     ref_type = models.CharField(max_length=20, choices=REF_TYPES, blank=True)
     ref_no = models.CharField(max_length=50, blank=True)
     remark = models.CharField(max_length=255, blank=True)
 
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-
+    # Client-generated id of the scan; a retried request carries the same key
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # date range reports filtered by IN/OUT
+            models.Index(fields=['movement_type', 'created_at'], name='movement_type_created_idx'),
+            # per product history (scan page) in time order
+            models.Index(fields=['product', 'created_at'], name='movement_product_created_idx'),
+            # keyset pagination of the movement list: (created_at, id) seeks
+            models.Index(fields=['created_at', 'id'], name='movement_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product} {self.movement_type} {self.quantity}"
+
+    @property
+    def balance_before(self):
+        if self.movement_type == self.IN:
+            return self.balance_after - self.quantity
+        return self.balance_after + self.quantity
     
+class StockDailySummary(models.Model):
+    """
+    Per product, per (local) day rollup of stock movements.
+
+    Maintained incrementally by warehouse.services whenever movements are
+    posted, so reports read a handful of rows per day instead of scanning
+    the movement history.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_summaries')
+    day = models.DateField()
+    qty_in = models.PositiveIntegerField(default=0)
+    qty_out = models.PositiveIntegerField(default=0)
+    # quantity * unit_price of the IN / OUT movements of the day
+    value_in = models.BigIntegerField(default=0)
+    income = models.BigIntegerField(default=0)
+    # product.stock after the last movement of the day
+    closing_balance = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='unique_product_day_summary'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='stock_summary_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} {self.day}"
+
+
+class SkuSequence(models.Model):
+    """Next SKU number of a category; see store.sku.allocate()."""
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='sku_sequence')
+    next_value = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.category} {self.next_value}"
+
+
 class Supplier(models.Model):
     name = models.CharField(max_length=200)
     phone = models.CharField(max_length=50, blank=True)
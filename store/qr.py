@@ -0,0 +1,108 @@
+"""
+QR code rendering, kept off the Product.save path.
+
+Product.save only schedules work here: once the transaction commits, the
+code is rendered on a small in-process thread pool. Products whose
+qr_code is still empty are the durable queue; anything a worker did not
+get to (crash, restart) is picked up by `manage.py generate_qr_codes`.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def qr_payload(sku):
+    """What the label encodes: ONLY the SKU, behind the CHUE| scheme."""
+    return f"CHUE|{sku}"
+
+
+def render_qr_png(sku):
+    """PNG bytes of the QR code for sku. Pure, so it can run in any process."""
+    qr = qrcode.QRCode(
+        version=1,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(qr_payload(sku))
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def store_qr_png(product, png):
+    """Write png to storage as product's QR image and return the stored name."""
+    field = product._meta.get_field('qr_code')
+    name = field.generate_filename(product, f"{product.sku}.png")
+    storage = field.storage
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(png))
+
+
+def generate_for(product_id):
+    """Render and attach the QR code of one product, unless it already has one."""
+    from .models import Product
+
+    product = Product.objects.filter(pk=product_id).only('pk', 'sku', 'qr_code').first()
+    if product is None or not product.sku or product.qr_code:
+        return
+    name = store_qr_png(product, render_qr_png(product.sku))
+    # A plain UPDATE: going through save() would re-run the save side effects
+    Product.objects.filter(pk=product_id).update(qr_code=name)
+
+
+def _run(product_ids):
+    for product_id in product_ids:
+        try:
+            generate_for(product_id)
+        except Exception:
+            logger.exception('QR generation failed for product %s', product_id)
+
+
+def _run_in_pool(product_ids):
+    # Pool threads outlive requests, so nothing else closes their connections.
+    # Inline runs share the request's connection and must leave it alone.
+    try:
+        _run(product_ids)
+    finally:
+        close_old_connections()
+
+
+def schedule(product_id):
+    """
+    Generate the QR code of product_id after the current transaction commits.
+
+    With QR_CODE_WORKERS = 0 the work runs inline in the on_commit hook.
+    """
+    schedule_many([product_id])
+
+
+def schedule_many(product_ids):
+    """schedule() for a batch of products, queued as one job."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    workers = getattr(settings, 'QR_CODE_WORKERS', 2)
+    if not workers:
+        transaction.on_commit(lambda: _run(product_ids))
+        return
+
+    def submit():
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qr')
+        _executor.submit(_run_in_pool, product_ids)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,190 @@
+"""
+Full-text product search kept inside the database.
+
+SQLite uses an FTS5 table (store_product_fts, rowid = product id) and
+PostgreSQL a weighted tsvector table (store_product_search) behind a GIN
+index; which one is used follows DB_ENGINE. Documents cover the product
+name, SKU, category, active variation values and description, and are
+rebuilt by Product.save / Variation.save through index_product() and
+dropped by store.signals when a product is deleted.
+"""
+import re
+
+from django.db import connection as default_connection
+
+SQLITE_TABLE = 'store_product_fts'
+POSTGRES_TABLE = 'store_product_search'
+
+# Upper bound on ranked hits per query; deeper pages are not worth scanning for
+MAX_RESULTS = 600
+
+# Column weights for bm25(), in FTS5 column order below
+SQLITE_WEIGHTS = (10.0, 10.0, 4.0, 4.0, 1.0)
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# One row per product: (id, name, sku, category, variations, description)
+_DOCUMENT_SQL = """
+    SELECT p.id, p.product_name, p.sku, c.category_name,
+           COALESCE((SELECT {concat} FROM store_variation v
+                     WHERE v.product_id = p.id AND v.is_active), ''),
+           p.description
+    FROM store_product p
+    JOIN category_category c ON c.id = p.category_id
+"""
+
+
+def supported(connection=default_connection):
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def install(connection=default_connection):
+    """Create the index table for this backend (called from a migration)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5('
+                'product_name, sku, category, variations, description, '
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ('
+                'product_id bigint PRIMARY KEY REFERENCES store_product (id) '
+                'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+                'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_idx '
+                f'ON {POSTGRES_TABLE} USING GIN (document)'
+            )
+
+
+def uninstall(connection=default_connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DROP TABLE IF EXISTS {POSTGRES_TABLE}')
+
+
+def index_product(product_id, connection=default_connection):
+    """(Re)build the search document of one product."""
+    index_products([product_id], connection)
+
+
+def index_products(product_ids, connection=default_connection):
+    """(Re)build the search documents of product_ids in one statement."""
+    product_ids = list(product_ids)
+    if product_ids:
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        _populate(connection, f'WHERE p.id IN ({placeholders})', product_ids)
+
+
+def remove_products(product_ids, connection=default_connection):
+    """
+    Drop the search documents of deleted products. PostgreSQL rows go with
+    the product through ON DELETE CASCADE; an FTS5 table has no foreign keys.
+    """
+    product_ids = list(product_ids)
+    if product_ids and connection.vendor == 'sqlite':
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+
+
+def rebuild_index(connection=default_connection):
+    """Rebuild every search document in one set-based statement."""
+    _populate(connection, '', [])
+
+
+def _populate(connection, where, params):
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            if params:
+                cursor.execute(f'DELETE FROM {SQLITE_TABLE} {where.replace("p.id", "rowid")}', params)
+            else:
+                cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} '
+                '(rowid, product_name, sku, category, variations, description) '
+                + _DOCUMENT_SQL.format(concat="group_concat(v.variation_value, ' ')")
+                + where,
+                params,
+            )
+        elif vendor == 'postgresql':
+            if not params:
+                cursor.execute(f'TRUNCATE {POSTGRES_TABLE}')
+            document = _DOCUMENT_SQL.format(concat="string_agg(v.variation_value, ' ')")
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (product_id, document) '
+                "SELECT d.id, "
+                "setweight(to_tsvector('simple', d.product_name), 'A') || "
+                "setweight(to_tsvector('simple', d.sku), 'A') || "
+                "setweight(to_tsvector('simple', d.category_name), 'B') || "
+                "setweight(to_tsvector('simple', d.variations), 'B') || "
+                "setweight(to_tsvector('simple', d.description), 'C') "
+                f'FROM ({document} {where}) '
+                'AS d (id, product_name, sku, category_name, variations, description) '
+                'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document',
+                params,
+            )
+
+
+def _query(keyword, connection):
+    """Backend query string matching every word of keyword as a prefix."""
+    words = _WORD.findall(keyword.lower())
+    if not words:
+        return ''
+    if connection.vendor == 'sqlite':
+        return ' '.join(f'"{w}"*' for w in words)
+    return ' & '.join(f'{w}:*' for w in words)
+
+
+def match_sql(keyword, connection=default_connection):
+    """
+    (sql, params) of a subquery selecting the ids of every product matching
+    keyword, for use as Product.objects.filter(pk__in=RawSQL(*match_sql(...))).
+    """
+    query = _query(keyword, connection)
+    if not query:
+        return 'SELECT NULL WHERE 1 = 0', []
+    if connection.vendor == 'sqlite':
+        return f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s', [query]
+    return (
+        f"SELECT product_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+        [query],
+    )
+
+
+def search_ids(keyword, limit=MAX_RESULTS, connection=default_connection):
+    """
+    Ids of available products matching every word of keyword, best first.
+
+    Each word is matched as a prefix, so results update while typing.
+    """
+    query = _query(keyword, connection)
+    if not query:
+        return []
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'SELECT f.rowid FROM {SQLITE_TABLE} f '
+                'JOIN store_product p ON p.id = f.rowid '
+                f'WHERE {SQLITE_TABLE} MATCH %s AND p.is_available '
+                f'ORDER BY bm25({SQLITE_TABLE}, {", ".join(map(str, SQLITE_WEIGHTS))}), f.rowid DESC '
+                'LIMIT %s',
+                [query, limit],
+            )
+        else:
+            cursor.execute(
+                f'SELECT s.product_id FROM {POSTGRES_TABLE} s '
+                'JOIN store_product p ON p.id = s.product_id '
+                "WHERE s.document @@ to_tsquery('simple', %s) AND p.is_available "
+                "ORDER BY ts_rank_cd(s.document, to_tsquery('simple', %s)) DESC, s.product_id DESC "
+                'LIMIT %s',
+                [query, query, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
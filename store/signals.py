@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import search
+from .models import Product
+
+
+@receiver(post_delete, sender=Product)
+def remove_search_document(sender, instance, **kwargs):
+    # Also covers queryset deletes and products cascaded from their category
+    if search.supported():
+        search.remove_products([instance.pk])
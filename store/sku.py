@@ -0,0 +1,59 @@
+"""
+SKU allocation from per-category sequences.
+
+Each category owns a SkuSequence row. Allocating n SKUs bumps it by n in
+one conditional UPDATE, so a whole block is reserved in a single write
+and SKUs are known before the products are inserted.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from category.models import Category
+
+
+def format_sku(prefix, number):
+    """Example: FW-00012"""
+    return f"{prefix}-{str(number).zfill(5)}"
+
+
+def category_prefix(sku_prefix, category_name):
+    return (sku_prefix or category_name[:2]).upper()
+
+
+def next_number(skus, prefix):
+    """First sequence number after every existing PREFIX-<n> SKU in skus."""
+    pattern = re.compile(rf'^{re.escape(prefix)}-(\d+)$')
+    numbers = [int(m.group(1)) for m in map(pattern.match, skus) if m]
+    return max(numbers, default=0) + 1
+
+
+def allocate(category_id, count=1):
+    """Reserve count consecutive SKUs in category_id and return them."""
+    from .models import Product, SkuSequence
+
+    with transaction.atomic():
+        sequences = SkuSequence.objects.filter(category_id=category_id)
+        if not sequences.update(next_value=F('next_value') + count):
+            # First SKU of this category: start after whatever SKUs it has
+            prefix = category_prefix(
+                *Category.objects.filter(pk=category_id).values_list('sku_prefix', 'category_name').get()
+            )
+            start = next_number(
+                Product.objects.filter(sku__startswith=f'{prefix}-').values_list('sku', flat=True).iterator(),
+                prefix,
+            )
+            try:
+                with transaction.atomic():
+                    SkuSequence.objects.create(category_id=category_id, next_value=start)
+            except IntegrityError:
+                pass  # created concurrently
+            sequences.update(next_value=F('next_value') + count)
+
+        end, sku_prefix, category_name = sequences.values_list(
+            'next_value', 'category__sku_prefix', 'category__category_name'
+        ).get()
+
+    prefix = category_prefix(sku_prefix, category_name)
+    return [format_sku(prefix, number) for number in range(end - count, end)]
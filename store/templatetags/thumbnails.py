@@ -0,0 +1,44 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from store import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', width=640, css_class='', style='', manifests=None):
+    """
+    <picture> for an ImageField: a WebP srcset with a JPEG fallback.
+
+    width is the rendered size for browsers without srcset support. Until
+    the variants exist the original is served and they are queued. Listings
+    pass manifests from thumbnails.lookup_many() instead of a cache read per
+    image.
+    """
+    if not image:
+        return ''
+    attrs = flatatt({'alt': alt, 'class': css_class or None, 'style': style or None, 'loading': 'lazy'})
+    if manifests is None:
+        manifest = thumbnails.lookup(image.name)
+    else:
+        manifest = manifests.get(image.name)
+    if manifest is None:
+        return format_html('<img src="{}"{}>', image.url, attrs)
+
+    sources = mark_safe(''.join(
+        format_html('<source type="{}" srcset="{}" sizes="{}">', mime, thumbnails.srcset(manifest, extension), sizes)
+        for extension, _, mime in thumbnails.FORMATS[:-1]
+        if manifest.get(extension)
+    ))
+    fallback = thumbnails.FORMATS[-1][0]
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{} decoding="async"></picture>',
+        sources,
+        thumbnails.best_url(manifest, fallback, width),
+        thumbnails.srcset(manifest, fallback),
+        sizes,
+        attrs,
+    )
@@ -1,3 +1,333 @@
-from django.test import TestCase
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from category.models import Category
+from chuefamily.cache import bump_version, get_version, pinned_versions
+from . import facets, search, sku, thumbnails
+from .facets import FACETS, FacetIndex
+from .models import Product, Variation
+
+
+# Templates use {% static %}; the manifest storage would need collectstatic first
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ListingQueryCountTests(TestCase):
+    """Listing pages must cost the same number of queries however many cards they show."""
+
+    def setUp(self):
+        # Catalog versions are bumped on commit, which never happens inside a TestCase
+        cache.clear()
+        self.categories = [
+            Category.objects.create(category_name=f'Category {i}', slug=f'category-{i}', sku_prefix=f'C{i}')
+            for i in range(3)
+        ]
+
+    def add_products(self, count):
+        start = Product.objects.count()
+        Product.objects.create_many(
+            Product(
+                product_name=f'Shoe {i}',
+                slug=f'shoe-{i}',
+                images='photos/products/shoe.jpg',
+                price=100 + i,
+                stock=1,
+                category=self.categories[i % len(self.categories)],
+            )
+            for i in range(start, start + count)
+        )
+        cache.clear()
+
+    def count_queries(self, url, data=None):
+        self.client.get(url, data)  # warm the facet index and the menu cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def assert_constant(self, url, data=None, expected=None):
+        self.add_products(1)
+        one, response = self.count_queries(url, data)
+        self.assertEqual(len(response.context['products']), 1)
+
+        self.add_products(5)
+        full, response = self.count_queries(url, data)
+        self.assertEqual(len(response.context['products']), 6)
+
+        self.assertEqual(one, full)
+        if expected is not None:
+            self.assertEqual(full, expected)
+
+    # Counted against the configured (database) cache: one get_many for the
+    # versions, the page, and the thumbnail manifests of its cards, which are
+    # never rendered here so the pending markers are read as well
+    def test_store(self):
+        self.assert_constant(reverse('store'), expected=4)
+
+    def test_store_filtered(self):
+        self.assert_constant(reverse('store'), {'min_price': 100, 'max_price': 200}, expected=4)
+
+    def test_search(self):
+        self.assert_constant(reverse('search'), {'keyword': 'shoe'}, expected=5)
+
+    @override_settings(HOME_FEED_SIZE=4)
+    def test_home(self):
+        # The feed is a per-process copy of a cached fragment: a warm homepage
+        # only reads the cache versions
+        self.add_products(6)
+        count, response = self.count_queries(reverse('home'))
+        self.assertEqual(count, 1)
+        self.assertContains(response, 'Shoe 5')
+        self.assertContains(response, 'card-product-grid', count=4)
+
+    def test_stale_home_feed_has_no_validators(self):
+        self.add_products(1)
+        self.assertTrue(self.client.get(reverse('home')).has_header('ETag'))
+        bump_version('catalog')
+        with mock.patch('chuefamily.views.threading.Thread') as thread:
+            response = self.client.get(reverse('home'))
+        # the old feed is served while it is rebuilt, so it must not be revalidated as current
+        thread.assert_called_once()
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertNotIn('s-maxage', response['Cache-Control'])
+
+        thread.call_args.kwargs['target'](*thread.call_args.kwargs['args'])
+        self.assertTrue(self.client.get(reverse('home')).has_header('ETag'))
+
+    def test_get_url_matches_reverse(self):
+        self.add_products(1)
+        product = Product.objects.with_urls().get()
+        expected = reverse('product_detail', args=[product.category.slug, product.slug])
+        with self.assertNumQueries(0):
+            self.assertEqual(product.get_url(), expected)
+        self.assertEqual(Product.objects.get().get_url(), expected)
+
+
+class PinnedVersionTests(TestCase):
+    def test_versions_are_read_once_per_request(self):
+        with pinned_versions():
+            get_version('catalog')  # creates every namespace's version
+        with pinned_versions():
+            with self.assertNumQueries(1):
+                catalog = get_version('catalog')
+                self.assertEqual(get_version('thumbs'), get_version('thumbs'))
+            # a write in the same request sees its own bump
+            bump_version('catalog')
+            with self.assertNumQueries(0):
+                self.assertGreater(get_version('catalog'), catalog)
+        self.assertEqual(get_version('catalog'), cache.get('version:catalog'))
+
+
+@override_settings(STORAGES=TEST_STORAGES, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        buffer = BytesIO()
+        Image.new('RGBA', (800, 600), (200, 30, 30, 128)).save(buffer, 'PNG')
+        self.name = default_storage.save('photos/products/shoe.png', ContentFile(buffer.getvalue()))
+
+    def render(self):
+        product = Product(images=self.name)
+        return Template('{% load thumbnails %}{% responsive_image product.images alt="Shoe" width=320 %}').render(
+            Context({'product': product})
+        )
+
+    def test_variants_are_content_hashed_and_never_upscaled(self):
+        manifest = thumbnails.generate(self.name)
+        self.assertEqual([width for width, _ in manifest['webp']], [160, 320, 640])
+        self.assertEqual(thumbnails.generate(self.name), manifest)
+        copy = default_storage.save('photos/products/copy.png', default_storage.open(self.name))
+        self.assertEqual(thumbnails.generate(copy)['jpg'], manifest['jpg'])
+
+    def test_tag_serves_original_until_variants_exist(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            html = self.render()
+        self.assertNotIn('srcset', html)
+        self.assertIn(default_storage.url(self.name), html)
+
+        html = self.render()
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('-320w.jpg" srcset=', html)
+
+    def test_lookup_many_reads_a_page_at_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(thumbnails.lookup_many([self.name, '', self.name]), {self.name: None})
+        with mock.patch.object(thumbnails, 'schedule_many') as schedule:
+            manifests = thumbnails.lookup_many([self.name])
+        schedule.assert_not_called()
+        self.assertEqual([width for width, _ in manifests[self.name]['webp']], [160, 320, 640])
+
+        template = Template('{% load thumbnails %}{% responsive_image image manifests=manifests %}')
+        with mock.patch.object(thumbnails, 'lookup') as lookup:
+            html = template.render(Context({'image': Product(images=self.name).images, 'manifests': manifests}))
+        lookup.assert_not_called()
+        self.assertIn('<source type="image/webp"', html)
+
+    def test_reloading_a_manifest_is_not_a_change(self):
+        with mock.patch.object(thumbnails, 'bump_version') as bump:
+            thumbnails._run([self.name])
+            bump.assert_called_once_with('thumbs')
+            cache.clear()  # evicted
+            thumbnails._run([self.name])
+            bump.assert_called_once()
+        self.assertIsNotNone(cache.get(thumbnails._cache_key(self.name)))
+
+
+@override_settings(STORAGES=TEST_STORAGES, QR_CODE_WORKERS=0)
+class SearchIndexTests(TestCase):
+    def test_category_rename_reindexes_its_products(self):
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        product = Product.objects.create(
+            product_name='Runner', slug='runner', images='photos/products/runner.jpg', price=10, stock=1,
+            category=category,
+        )
+        self.assertEqual(search.search_ids('footwear'), [product.pk])
+
+        category.category_name = 'Sneakers'
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        self.assertEqual(search.search_ids('sneakers'), [product.pk])
+        self.assertEqual(search.search_ids('footwear'), [])
+
+    def test_deleted_products_leave_the_index(self):
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        runner, trail = [
+            Product.objects.create(
+                product_name=name, slug=name.lower(), images='photos/products/shoe.jpg', price=10, stock=1,
+                category=category,
+            )
+            for name in ('Runner', 'Trail')
+        ]
+        runner.delete()
+        Product.objects.filter(pk=trail.pk).delete()
+        sql, params = search.match_sql('footwear')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            self.assertEqual(cursor.fetchall(), [])
+
+    def test_count_covers_matches_beyond_the_ranked_page(self):
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        for i in range(4):
+            Product.objects.create(
+                product_name=f'Shoe {i}', slug=f'shoe-{i}', images='photos/products/shoe.jpg', price=10, stock=1,
+                category=category, is_available=i != 3,
+            )
+        with mock.patch.object(search, 'MAX_RESULTS', 2):
+            response = self.client.get(reverse('search'), {'keyword': 'shoe'})
+        self.assertEqual(response.context['product_count'], 3)
+        self.assertEqual(len(response.context['products']), 2)
+
+    def test_fallback_resolves_urls_with_the_page(self):
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        Product.objects.create(
+            product_name='Runner', slug='runner', images='photos/products/shoe.jpg', price=10, stock=1,
+            category=category,
+        )
+        with mock.patch.object(search, 'supported', return_value=False):
+            response = self.client.get(reverse('search'), {'keyword': 'run'})
+        product = response.context['products'][0]
+        with self.assertNumQueries(0):
+            self.assertEqual(product.get_url(), reverse('product_detail', args=['footwear', 'runner']))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class FacetIndexTests(TestCase):
+    def setUp(self):
+        self.category = category = Category.objects.create(
+            category_name='Footwear', slug='footwear', sku_prefix='FW',
+        )
+        for i in range(8):
+            product = Product.objects.create(
+                product_name=f'Shoe {i}', slug=f'shoe-{i}', images='photos/products/shoe.jpg',
+                price=100 * (i + 1), stock=1, category=category, is_available=i != 7,
+            )
+            Variation.objects.create(product=product, variation_category='size', variation_value=str(40 + i % 3))
+            Variation.objects.create(product=product, variation_category='color', variation_value=('red', 'blue')[i % 2])
+            # inactive options must not count
+            Variation.objects.create(
+                product=product, variation_category='color', variation_value='green', is_active=i % 2 == 0,
+            )
+        self.index = FacetIndex.build()
+
+    def expected(self, selected, min_price, max_price):
+        products = Product.objects.filter(is_available=True, price__gte=min_price, price__lte=max_price)
+
+        def narrow(queryset, exclude=None):
+            for facet, values in selected.items():
+                if facet != exclude:
+                    queryset = queryset.filter(pk__in=Variation.objects.filter(
+                        is_active=True, variation_category=facet, variation_value__in=values,
+                    ).values('product'))
+            return queryset
+
+        counts = {}
+        for facet in FACETS:
+            base = narrow(products, exclude=facet)
+            values = Variation.objects.filter(product__in=base, is_active=True, variation_category=facet)
+            counts[facet] = {
+                value: base.filter(variation__is_active=True, variation__variation_category=facet,
+                                   variation__variation_value=value).count()
+                for value in values.values_list('variation_value', flat=True).distinct()
+            }
+        ids = list(narrow(products).order_by('-created_at', '-id').values_list('id', flat=True))
+        return ids, counts
+
+    def test_query_matches_a_plain_queryset(self):
+        for selected in ({}, {'size': ['41']}, {'size': ['40', '42'], 'color': ['red']}, {'color': ['green']}):
+            for min_price, max_price in ((0, 10000), (200, 500)):
+                result = self.index.query(selected, min_price, max_price)
+                ids, counts = self.expected(selected, min_price, max_price)
+                self.assertEqual(result['product_ids'], ids)
+                for facet in FACETS:
+                    nonzero = {value: n for value, n in result['counts'][facet].items() if n}
+                    self.assertEqual(nonzero, counts[facet], (selected, min_price, facet))
+
+    def test_local_copies_are_dropped_on_a_catalog_change(self):
+        first = facets.get_index()
+        self.assertIs(facets.get_index(), first)
+        bump_version('catalog')
+        second = facets.get_index(self.category.pk)
+        self.assertEqual(list(facets._local), [get_version('catalog')])
+        self.assertEqual(list(facets._local[get_version('catalog')]), [self.category.pk])
+        self.assertIsNot(facets.get_index(), first)
+        self.assertIs(facets.get_index(self.category.pk), second)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class SkuAllocationTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+
+    def test_blocks_never_overlap(self):
+        skus = sku.allocate(self.category.pk, 3) + sku.allocate(self.category.pk) + sku.allocate(self.category.pk, 2)
+        self.assertEqual(skus, [f'FW-0000{n}' for n in range(1, 7)])
+
+    def test_sequence_starts_after_existing_skus(self):
+        Product.objects.create(
+            product_name='Old', slug='old', sku='FW-00041', images='photos/products/old.jpg', price=1, stock=0,
+            category=self.category,
+        )
+        created = Product.objects.create_many(
+            Product(product_name=f'Shoe {i}', slug=f'shoe-{i}', images='photos/products/shoe.jpg', price=1, stock=0,
+                    category=self.category)
+            for i in range(3)
+        )
+        self.assertEqual([product.sku for product in created], ['FW-00042', 'FW-00043', 'FW-00044'])
+        self.assertEqual(Product.objects.create(
+            product_name='New', slug='new', images='photos/products/new.jpg', price=1, stock=0, category=self.category,
+        ).sku, 'FW-00045')
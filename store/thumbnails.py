@@ -0,0 +1,230 @@
+"""
+Resized WebP/JPEG variants of uploaded images, for srcset.
+
+Variants are stored next to the media under thumbs/, named after a hash of
+the original's content, so they can be served with far-future caching and
+identical uploads share files. Each original gets a small JSON manifest
+listing its variants; pages read the manifest from the cache and never
+touch storage. An image without a manifest yet is rendered at full size
+and queued for generation, like QR codes: on a small thread pool after
+commit, or in bulk with `manage.py generate_thumbnails`.
+"""
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from chuefamily.cache import bump_version
+
+logger = logging.getLogger(__name__)
+
+# Rendered widths in pixels; never wider than the original
+WIDTHS = (160, 320, 640, 960)
+# (extension, Pillow format, MIME type), preferred first
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpg', 'JPEG', 'image/jpeg'),
+)
+QUALITY = 80
+THUMB_DIR = 'thumbs'
+# Seconds before an image whose generation is queued (or failed) is queued again
+PENDING_TIMEOUT = 300
+
+_executor = None
+
+
+def _cache_key(name):
+    return f'thumbs:{name}'
+
+
+def _manifest_name(name):
+    return f'{THUMB_DIR}/manifest/{hashlib.sha1(name.encode()).hexdigest()}.json'
+
+
+def render_variants(data):
+    """
+    Content digest and {(extension, width): bytes} of every variant of the
+    image in data. Pure, so it can run in any process.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    widths = [width for width in WIDTHS if width < image.width] or [image.width]
+
+    variants = {}
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for extension, fmt, _ in FORMATS:
+            frame = resized
+            if fmt == 'JPEG' and frame.mode != 'RGB':
+                # flatten transparency onto white, JPEG has no alpha
+                background = Image.new('RGB', frame.size, 'white')
+                rgba = frame.convert('RGBA')
+                background.paste(rgba, mask=rgba.getchannel('A'))
+                frame = background
+            buffer = BytesIO()
+            frame.save(buffer, format=fmt, quality=QUALITY, optimize=True)
+            variants[extension, width] = buffer.getvalue()
+    return digest, variants
+
+
+def store_variants(name, digest, variants, storage=None):
+    """Save rendered variants and the manifest of original name; return the manifest."""
+    storage = storage or default_storage
+    manifest = {extension: [] for extension, _, _ in FORMATS}
+    for (extension, width), data in sorted(variants.items(), key=lambda item: item[0][1]):
+        variant = f'{THUMB_DIR}/{digest[:2]}/{digest}-{width}w.{extension}'
+        if not storage.exists(variant):
+            variant = storage.save(variant, ContentFile(data))
+        manifest[extension].append([width, variant])
+
+    manifest_name = _manifest_name(name)
+    if storage.exists(manifest_name):
+        storage.delete(manifest_name)
+    storage.save(manifest_name, ContentFile(json.dumps(manifest).encode()))
+    cache.set(_cache_key(name), manifest, None)
+    return manifest
+
+
+def load_manifest(name, storage=None):
+    """Stored manifest of original name (also put back in the cache), or None."""
+    storage = storage or default_storage
+    manifest_name = _manifest_name(name)
+    if not storage.exists(manifest_name):
+        return None
+    with storage.open(manifest_name) as handle:
+        manifest = json.load(handle)
+    cache.set(_cache_key(name), manifest, None)
+    return manifest
+
+
+def generate(name, storage=None, force=False):
+    """
+    Make sure original name has variants, and return its manifest.
+
+    An existing manifest is only loaded back into the cache unless force.
+    """
+    storage = storage or default_storage
+    manifest = None if force else load_manifest(name, storage)
+    if manifest is not None:
+        return manifest
+
+    with storage.open(name) as handle:
+        data = handle.read()
+    digest, variants = render_variants(data)
+    return store_variants(name, digest, variants, storage)
+
+
+def _pending_key(name):
+    # set while an image is queued, so a failing one is retried every few minutes
+    return f'thumbs-pending:{name}'
+
+
+def lookup(name):
+    """
+    Cached manifest of original name, or None after queueing it.
+
+    Costs one cache read; storage is only touched by the background job.
+    """
+    manifest = cache.get(_cache_key(name))
+    if manifest is None and cache.add(_pending_key(name), True, PENDING_TIMEOUT):
+        schedule_many([name])
+    return manifest
+
+
+def lookup_many(names):
+    """
+    {name: manifest or None} for a page of images, in one cache read.
+
+    Pass the result to {% responsive_image ... manifests=... %} so a listing
+    costs the same however many cards it shows. Images without a manifest
+    are queued like lookup() does, which costs a couple more round trips
+    until their variants exist.
+    """
+    names = [name for name in dict.fromkeys(names) if name]
+    if not names:
+        return {}
+    found = cache.get_many([_cache_key(name) for name in names])
+    manifests = {name: found.get(_cache_key(name)) for name in names}
+
+    missing = [name for name, manifest in manifests.items() if manifest is None]
+    if missing:
+        pending = cache.get_many([_pending_key(name) for name in missing])
+        queue = [name for name in missing if _pending_key(name) not in pending]
+        if queue:
+            cache.set_many({_pending_key(name): True for name in queue}, PENDING_TIMEOUT)
+            schedule_many(queue)
+    return manifests
+
+
+def _run(names):
+    generated = False
+    for name in names:
+        try:
+            # after a cache eviction the manifest is only reloaded; pages
+            # rendered with it are still current, so that is no change
+            if load_manifest(name) is None:
+                generate(name, force=True)
+                generated = True
+        except Exception:
+            # the pending marker stays, so a broken file is retried only every few minutes
+            logger.exception('Thumbnail generation failed for %s', name)
+    if generated:
+        # pages rendered without srcset (ETags, the cached home feed) go stale
+        bump_version('thumbs')
+
+
+def _run_in_pool(names):
+    # The cache may be the database, and nothing else closes a pool thread's
+    # connection; inline runs share the request's and leave it alone.
+    try:
+        _run(names)
+    finally:
+        close_old_connections()
+
+
+def schedule_many(names):
+    """
+    Generate variants of the given storage names after the current
+    transaction commits. With THUMBNAIL_WORKERS = 0 the work runs inline.
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+    workers = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+    if not workers:
+        transaction.on_commit(lambda: _run(names))
+        return
+
+    def submit():
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbs')
+        _executor.submit(_run_in_pool, names)
+
+    transaction.on_commit(submit)
+
+
+def srcset(manifest, extension, storage=None):
+    storage = storage or default_storage
+    return ', '.join(f'{storage.url(variant)} {width}w' for width, variant in manifest.get(extension, []))
+
+
+def best_url(manifest, extension, width, storage=None):
+    """URL of the narrowest variant at least width wide (else the widest)."""
+    storage = storage or default_storage
+    variants = manifest.get(extension) or []
+    if not variants:
+        return None
+    chosen = next((variant for w, variant in variants if w >= width), variants[-1][1])
+    return storage.url(chosen)
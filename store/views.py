@@ -2,150 +2,137 @@ from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
 from category.models import Category
 from .models import Product, Variation
-from django.db.models import Q
-from django.db.models import Min, Max
+from . import search as search_index, thumbnails
+from django.db.models import Prefetch, Q
+from django.db.models.expressions import RawSQL
+from .facets import get_index as get_facet_index
+from .caching import catalog_conditional
 
+@catalog_conditional
 def store(request, category_slug=None):
-    # Base queryset
-    products = Product.objects.filter(is_available=True)
-
-    # Category filter
+    # Facet index of the category (or whole catalog), cached per catalog version
+    category_id = None
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
-        products = products.filter(category=category)
+        category_id = category.id
+    index = get_facet_index(category_id)
 
-    # Size filter
+    # Size / color filters
     selected_sizes = request.GET.getlist('size')
-    if selected_sizes:
-        products = products.filter(
-            variation__variation_category='size',
-            variation__variation_value__in=selected_sizes,
-            variation__is_active=True
-        ).distinct()
-
-    # Dynamic sizes (always available)
-    sizes = (
-        Variation.objects.sizes()
-        .filter(product__in=products)
-        .values_list('variation_value', flat=True)
-        .distinct()
-        .order_by('variation_value')
-    )
-    # price filter from DB
-    price_stats = products.aggregate(min_price=Min('price'), max_price=Max('price'))
-    db_min_price = price_stats['min_price']
-    db_max_price = price_stats['max_price']
-    # Build 5 dynamic ranges
-    price_ranges = _build_price_ranges(db_min_price, db_max_price, buckets=5)
+    selected_colors = request.GET.getlist('color')
+
     # from browser request
     min_price = request.GET.get('min_price')
     max_price = request.GET.get('max_price')
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
 
-    # Order newest first
-    products = products.order_by('-created_at')
+    result = index.query(
+        {'size': selected_sizes, 'color': selected_colors},
+        min_price=_parse_price(min_price),
+        max_price=_parse_price(max_price),
+    )
 
-    # Pagination (consistent)
-    paginator = Paginator(products, 6)
+    # Pagination (consistent), newest first; only the visible page is fetched
+    paginator = Paginator(result['product_ids'], 6)
     page = request.GET.get('page')
     paged_products = paginator.get_page(page)
+    found = Product.objects.with_urls().in_bulk(paged_products.object_list)
+    paged_products.object_list = [found[pk] for pk in paged_products.object_list if pk in found]
 
+    counts = result['counts']
     context = {
         'products': paged_products,
-        'product_count': products.count(),
-        'sizes': sizes,
+        'thumbnail_manifests': thumbnails.lookup_many(p.images.name for p in paged_products),
+        'product_count': paginator.count,
+        # Dynamic sizes / colors with the number of products each would show
+        'sizes': [value for value, count in counts['size'].items() if count],
+        'size_counts': counts['size'],
         'selected_sizes': selected_sizes,
+        'colors': [value for value, count in counts['color'].items() if count],
+        'color_counts': counts['color'],
+        'selected_colors': selected_colors,
         #price filter values 
         'min_price': min_price, 
         'max_price': max_price,
 
         #dynamic range info
-        'db_min_price': db_min_price,
-        'db_max_price': db_max_price,
-        'price_ranges': price_ranges,
+        'db_min_price': index.min_price,
+        'db_max_price': index.max_price,
+        'price_ranges': result['price_ranges'],
     }
 
     return render(request, 'store/store.html', context)
 
-def _build_price_ranges(min_p, max_p, buckets=5):
-    """
-    Return list of dicts:
-    [{'min': 100, 'max': 180}, ...] length=buckets
-
-    Uses equal-width ranges. Handles edge cases (min==max, None).
-    """
-    if min_p is None or max_p is None:
-        return []
-    min_p = int(min_p)
-    max_p = int(max_p)
-
-    if min_p >= max_p:
-        #All products are the same prices --> one range
-        return [{
-            'min': min_p,
-            'max': max_p,
-            }]
-    span = max_p - min_p
-    step = max(1, span // buckets) #avoid zero step 
-
-    ranges = []
-    start = min_p
-    for i in range(buckets):
-        end = start + step
-        if i == buckets -1:
-            end = max_p
-        ranges.append({
-            'min': start,
-            'max': end,
-        })
-        start = end + 1
-
-        if start > max_p:
-            break
-    return ranges
+def _parse_price(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
 
+@catalog_conditional
 def product_detail(request, category_slug, product_slug):
     """
     Product detail page:
     /store/<category_slug>/<product_slug>/
+
+    One query for the product with its category (both slugs unique and
+    indexed), one for its active colors/sizes.
     """
-    category = get_object_or_404(Category, slug=category_slug)
-    product = get_object_or_404(Product, slug=product_slug)
+    product = get_object_or_404(
+        Product.objects.select_related('category').prefetch_related(
+            Prefetch('variation_set', queryset=Variation.objects.options().order_by('id'), to_attr='options')
+        ),
+        slug=product_slug,
+        category__slug=category_slug,
+    )
 
     context = {
         'single_product': product,
+        'colors': [v for v in product.options if v.variation_category == 'color'],
+        'sizes': [v for v in product.options if v.variation_category == 'size'],
     }
     return render(request, 'store/product_detail.html', context)
 
+@catalog_conditional
 def search(request):
     """
-    Search products by keyword in product_name (and optionally description).
+    Search products by keyword across name, SKU, category, variations and
+    description, best matches first.
     URL:
       /store/search/?keyword=xxx
     """
     keyword = request.GET.get('keyword', '').strip()
-    product_qs = Product.objects.filter(is_available=True)
-
-    if keyword:
-        # Add more fields here if your Product model has them (description, brand, etc.)
-        product_qs = product_qs.filter(
-            Q(product_name__icontains=keyword) |
-            Q(description__icontains=keyword)
-        ).order_by('-created_at')
 
+    if search_index.supported():
+        # Ranked ids from the full-text index, then one query for the page
+        product_ids = search_index.search_ids(keyword, search_index.MAX_RESULTS) if keyword else []
+        paginator = Paginator(product_ids, 6)
+        paged_products = paginator.get_page(request.GET.get('page'))
+        found = Product.objects.with_urls().in_bulk(paged_products.object_list)
+        paged_products.object_list = [found[pk] for pk in paged_products.object_list if pk in found]
+        product_count = len(product_ids)
+        if product_count == search_index.MAX_RESULTS:
+            # Only the best MAX_RESULTS are paged; the count covers every match
+            product_count = Product.objects.filter(
+                is_available=True, pk__in=RawSQL(*search_index.match_sql(keyword)),
+            ).count()
+    else:
+        product_qs = Product.objects.with_urls().filter(is_available=True)
+        if keyword:
+            product_qs = product_qs.filter(
+                Q(product_name__icontains=keyword) |
+                Q(description__icontains=keyword)
+            ).order_by('-created_at')
+        else:
+            product_qs = product_qs.none()
         paginator = Paginator(product_qs, 6)
-        page = request.GET.get('page')
-        paged_products = paginator.get_page(page)
-
-        context = {
-            'products': paged_products,
-            'product_count': product_qs.count(),
-        }
-        return render(request, 'store/store.html', context)
-    
+        paged_products = paginator.get_page(request.GET.get('page'))
+        product_count = paginator.count
 
+    context = {
+        'products': paged_products,
+        'thumbnail_manifests': thumbnails.lookup_many(p.images.name for p in paged_products),
+        'product_count': product_count,
+    }
+    return render(request, 'store/store.html', context)
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Revoked group memberships reach other workers through the cache version
+    of warehouse.permissions.group_names, so the cache must be shared.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith('.LocMemCache'):
+        return [Error(
+            'The default cache is local to each process, so a revoked warehouse '
+            'group membership would stay cached in the other workers.',
+            hint='Configure a shared cache backend (Redis or DatabaseCache) in CACHES.',
+            id='warehouse.E001',
+        )]
+    return []
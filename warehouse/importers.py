@@ -0,0 +1,148 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from store.models import Product, StockMovement
+from .services import InsufficientStock, post_new_movements
+
+# Columns / keys understood by the importer. Only sku, action and quantity
+# are required; unit_price falls back to the product's current price.
+FIELDS = ('sku', 'action', 'quantity', 'unit_price', 'ref_type', 'ref_no', 'remark', 'idempotency_key')
+BATCH_SIZE = 5000
+MAX_ERRORS = 50
+VALID_REF_TYPES = {code for code, _ in StockMovement.REF_TYPES}
+
+
+class ImportFailed(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f'{len(errors)} row(s) failed validation')
+
+
+def read_rows(stream, fmt):
+    """Yield (line_no, dict) from a CSV or JSON-lines text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_no, row if isinstance(row, dict) else {'_invalid': line}
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def import_movements(stream, fmt, created_by=None, batch_size=BATCH_SIZE):
+    """
+    Load a whole file of movements in one transaction.
+
+    Rows are validated batch by batch (one sku__in lookup per batch) and
+    handed to post_movements_bulk, so the cost is a bulk INSERT plus one
+    UPDATE per product per batch instead of three statements per row.
+    Nothing is posted if any row fails; ImportFailed carries the errors.
+    Rows whose idempotency_key was already posted are skipped, so the
+    same file can be imported again safely.
+    """
+    rows = read_rows(stream, fmt)
+    products = {}
+    total = 0
+
+    with transaction.atomic():
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            wanted = {str(row.get('sku') or '').strip() for _, row in batch} - products.keys()
+            products.update(Product.objects.filter(sku__in=wanted).only('id', 'sku').in_bulk(field_name='sku'))
+
+            movements, errors = _build_movements(batch, products, created_by)
+            if errors:
+                raise ImportFailed(errors)
+
+            try:
+                posted, _ = post_new_movements(movements)
+            except InsufficientStock as exc:
+                raise ImportFailed([f'{exc.product.sku}: {exc}'])
+            total += len(posted)
+
+    return total
+
+
+def _build_movements(batch, products, created_by):
+    movements = []
+    errors = []
+
+    for line_no, row in batch:
+        if len(errors) >= MAX_ERRORS:
+            break
+        if '_invalid' in row:
+            errors.append(f'Line {line_no}: not a JSON object')
+            continue
+
+        movement, error = build_movement(row, products, created_by)
+        if error:
+            errors.append(f'Line {line_no}: {error}')
+        else:
+            movements.append(movement)
+
+    return movements, errors
+
+
+def build_movement(row, products, created_by=None):
+    """
+    Validate one movement row against the scan form rules.
+
+    products maps SKU to Product. Returns (unsaved StockMovement, None), or
+    (None, error message) when the row is rejected.
+    """
+    sku = str(row.get('sku') or '').strip()
+    action = str(row.get('action') or '').strip().upper()
+    ref_type = str(row.get('ref_type') or '').strip()
+
+    try:
+        qty = int(row.get('quantity'))
+    except (TypeError, ValueError):
+        qty = 0
+
+    unit_price = row.get('unit_price')
+    if unit_price in (None, ''):
+        unit_price = None
+    else:
+        try:
+            unit_price = int(unit_price)
+        except (TypeError, ValueError):
+            return None, 'invalid unit_price'
+
+    product = products.get(sku)
+    if product is None:
+        return None, f'unknown SKU "{sku}"'
+    if qty <= 0:
+        return None, 'quantity must be greater than 0'
+    if action not in (StockMovement.IN, StockMovement.OUT):
+        return None, f'invalid action "{action}"'
+    if ref_type and ref_type not in VALID_REF_TYPES:
+        return None, f'invalid reference type "{ref_type}"'
+    if ref_type and ref_type not in StockMovement.ALLOWED_REF_TYPES[action]:
+        return None, f'ref type {ref_type} is not allowed for {action}'
+
+    return StockMovement(
+        product=product,
+        movement_type=action,
+        quantity=qty,
+        unit_price=unit_price,
+        ref_type=ref_type,
+        ref_no=str(row.get('ref_no') or '').strip()[:50],
+        remark=str(row.get('remark') or '').strip()[:255],
+        created_by=created_by,
+        idempotency_key=str(row.get('idempotency_key') or '').strip()[:64] or None,
+    ), None
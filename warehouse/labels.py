@@ -0,0 +1,153 @@
+"""
+Print-ready QR label sheets.
+
+QR codes are drawn straight from the module matrix as one SVG path per
+SKU (no PNG round trip) and cached by SKU, since the payload only depends
+on it. Sheets are generated label by label from an iterator, so memory
+stays flat whether a sheet holds 24 labels or 5,000.
+"""
+from itertools import islice
+
+import qrcode
+from django.core.cache import cache
+from django.utils.html import escape
+
+from store.qr import qr_payload
+
+# A4 portrait, 3 x 8 labels of 70 x 37 mm
+PAGE_WIDTH, PAGE_HEIGHT = 210, 297
+COLUMNS, ROWS = 3, 8
+LABEL_WIDTH, LABEL_HEIGHT = 70, 37
+QR_SIZE = 29
+MARGIN_TOP = (PAGE_HEIGHT - ROWS * LABEL_HEIGHT) / 2
+LABELS_PER_PAGE = COLUMNS * ROWS
+
+# Labels are resolved against the cache in chunks of this many SKUs
+CHUNK_SIZE = 200
+QR_PATH_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+# Bump when the path format changes
+QR_PATH_VERSION = 1
+
+
+def qr_svg_path(sku):
+    """Return (size, d): the module count and an SVG path drawing the dark modules."""
+    qr = qrcode.QRCode(version=1, border=0)
+    qr.add_data(qr_payload(sku))
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                width = x - start
+                parts.append(f'M{start} {y}h{width}v1h-{width}z')
+            else:
+                x += 1
+    return len(matrix), ''.join(parts)
+
+
+def _cache_key(sku):
+    return f'qr-path:{QR_PATH_VERSION}:{sku}'
+
+
+def qr_svg_paths(skus):
+    """qr_svg_path() for many SKUs, served from and filling the cache."""
+    keys = {sku: _cache_key(sku) for sku in skus}
+    cached = cache.get_many(keys.values())
+    paths, missing = {}, {}
+    for sku, key in keys.items():
+        if key in cached:
+            paths[sku] = cached[key]
+        else:
+            paths[sku] = missing[key] = qr_svg_path(sku)
+    if missing:
+        cache.set_many(missing, QR_PATH_CACHE_TIMEOUT)
+    return paths
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _labels(rows):
+    """Yield (sku, name, price, (size, d)) for rows of (sku, name, price)."""
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        paths = qr_svg_paths({sku for sku, _, _ in chunk})
+        for sku, name, price in chunk:
+            yield sku, name, price, paths[sku]
+
+
+def _label_svg(sku, name, price, path, x=0, y=0):
+    size, d = path
+    return (
+        f'<g transform="translate({x} {y})">'
+        f'<svg x="3" y="4" width="{QR_SIZE}" height="{QR_SIZE}" viewBox="0 0 {size} {size}" '
+        f'shape-rendering="crispEdges"><path d="{d}"/></svg>'
+        f'<text x="35" y="12" font-size="3.2" font-weight="bold">{escape(name[:28])}</text>'
+        f'<text x="35" y="19" font-size="3.6" font-family="monospace">{escape(sku)}</text>'
+        f'<text x="35" y="26" font-size="3.2">MMK {price:,}</text>'
+        '</g>'
+    )
+
+
+def _pages(rows):
+    """Yield the labels of rows one page at a time, as lists of positioned <g> elements."""
+    page = []
+    for sku, name, price, path in _labels(rows):
+        slot = len(page)
+        column, row = slot % COLUMNS, slot // COLUMNS
+        page.append(_label_svg(sku, name, price, path, column * LABEL_WIDTH, MARGIN_TOP + row * LABEL_HEIGHT))
+        if len(page) == LABELS_PER_PAGE:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def stream_svg_sheet(rows, count):
+    """
+    One SVG document with the A4 pages stacked vertically.
+
+    count is the number of labels rows will yield; it sizes the document
+    up front so the sheet can be streamed.
+    """
+    pages = max(1, -(-count // LABELS_PER_PAGE))
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{PAGE_WIDTH}mm" height="{PAGE_HEIGHT * pages}mm" '
+        f'viewBox="0 0 {PAGE_WIDTH} {PAGE_HEIGHT * pages}" font-family="sans-serif">'
+    )
+    for number, page in enumerate(_pages(rows)):
+        yield f'<g transform="translate(0 {number * PAGE_HEIGHT})">{"".join(page)}</g>'
+    yield '</svg>'
+
+
+def stream_html_sheet(rows, title='QR labels'):
+    """
+    An HTML page of A4 label sheets, one inline SVG per page.
+
+    rows yields (sku, name, price); the browser prints one sheet per page.
+    """
+    yield (
+        '<!doctype html><html><head><meta charset="utf-8">'
+        f'<title>{escape(title)}</title><style>'
+        '@page { size: A4; margin: 0; }'
+        'body { margin: 0; font-family: sans-serif; }'
+        '.sheet { display: block; width: 210mm; height: 297mm; page-break-after: always; }'
+        '.sheet:last-child { page-break-after: auto; }'
+        '@media screen { body { background: #ccc; } .sheet { background: #fff; margin: 8px auto; } }'
+        '</style></head><body>'
+    )
+    for page in _pages(rows):
+        yield (
+            '<svg class="sheet" xmlns="http://www.w3.org/2000/svg" '
+            f'viewBox="0 0 {PAGE_WIDTH} {PAGE_HEIGHT}">{"".join(page)}</svg>'
+        )
+    yield '</body></html>'
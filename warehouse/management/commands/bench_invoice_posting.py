@@ -0,0 +1,123 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+
+from category.models import Category
+from store.models import (
+    Product, StockMovement, Supplier, SupplierInvoice, SupplierInvoiceItem, bump_catalog_version,
+)
+from warehouse.services import post_invoice
+
+
+class Command(BaseCommand):
+    help = (
+        "Create synthetic DRAFT supplier invoices, post them from parallel "
+        "threads (each invoice twice, to exercise idempotency) and report timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=4)
+        parser.add_argument('--lines', type=int, default=1000, help='Lines per invoice')
+        parser.add_argument('--products', type=int, default=500, help='Distinct products shared by the invoices')
+        parser.add_argument('--parallel', type=int, default=4)
+        parser.add_argument('--keep', action='store_true', help='Keep the bench data afterwards')
+
+    def handle(self, *args, **options):
+        tag = time.time_ns()
+        category, _ = Category.objects.get_or_create(
+            slug='bench-invoice',
+            defaults={'category_name': 'Bench Invoice', 'sku_prefix': 'BENCHINV'},
+        )
+        supplier = Supplier.objects.create(name=f'Bench supplier {tag}')
+        # One bulk insert and no QR codes, so nothing is written to MEDIA_ROOT
+        products = Product.objects.create_many(
+            (
+                Product(
+                    product_name=f'Bench invoice {tag}-{i}',
+                    slug=f'bench-invoice-{tag}-{i}',
+                    price=100,
+                    stock=0,
+                    category=category,
+                )
+                for i in range(options['products'])
+            ),
+            qr_codes=False,
+        )
+        try:
+            self.run(tag, supplier, products, options)
+        finally:
+            if not options['keep']:
+                StockMovement.objects.filter(product__in=products).delete()
+                SupplierInvoice.objects.filter(supplier=supplier).delete()
+                Product.objects.filter(pk__in=[p.pk for p in products]).delete()
+                supplier.delete()
+                category.delete()
+                bump_catalog_version()
+
+    def run(self, tag, supplier, products, options):
+        invoices = []
+        for n in range(options['invoices']):
+            invoice = SupplierInvoice.objects.create(supplier=supplier, inv_no=f'B{tag % 10**12}-{n}')
+            SupplierInvoiceItem.objects.bulk_create(
+                SupplierInvoiceItem(
+                    invoice=invoice,
+                    product=products[i % len(products)],
+                    quantity=1 + i % 7,
+                )
+                for i in range(options['lines'])
+            )
+            invoices.append(invoice)
+
+        # every invoice is queued twice; the second post must be a no-op
+        queue = invoices + invoices
+        timings = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if not queue:
+                            return
+                        invoice = SupplierInvoice(pk=queue.pop().pk)
+                    started = time.perf_counter()
+                    created = post_invoice(invoice)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        timings.append((len(created), elapsed))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['parallel'])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+
+        posted = sorted(t for n, t in timings if n)
+        lines = sum(n for n, _ in timings)
+        expected_qty = options['invoices'] * sum(1 + i % 7 for i in range(options['lines']))
+        stock = Product.objects.filter(pk__in=[p.pk for p in products]).aggregate(s=Sum('stock'))['s'] or 0
+        moved = StockMovement.objects.filter(product__in=products).aggregate(s=Sum('quantity'))['s'] or 0
+
+        self.stdout.write(
+            f"invoices={len(posted)}/{options['invoices']} lines={lines} "
+            f"parallel={options['parallel']} wall={wall:.2f}s ({lines / wall:.0f} lines/sec)"
+        )
+        if posted:
+            self.stdout.write(
+                f"per invoice: min={posted[0] * 1000:.0f}ms "
+                f"median={posted[len(posted) // 2] * 1000:.0f}ms max={posted[-1] * 1000:.0f}ms"
+            )
+        self.stdout.write(f"stock={stock} movements={moved} expected={expected_qty}")
+
+        ok = len(posted) == options['invoices'] and stock == moved == expected_qty
+        if ok:
+            self.stdout.write(self.style.SUCCESS('All invoices posted exactly once'))
+        else:
+            self.stderr.write(self.style.ERROR('Mismatch between invoices and posted stock'))
@@ -0,0 +1,139 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from category.models import Category
+from store.models import Product, StockMovement
+from warehouse.utils import date_range_filter
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic StockMovement history and compare query plans and "
+        "latency of created_at__date filters against half-open datetime ranges. "
+        "Run it against a scratch database: it inserts --rows movements."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5_000_000)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=730, help='History spread over this many days')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic rows afterwards')
+
+    def handle(self, *args, **options):
+        products = self._seed(options)
+        today = timezone.localdate()
+        start, end = today - timedelta(days=14), today
+        product = products[len(products) // 2]
+
+        out = StockMovement.objects.filter(movement_type=StockMovement.OUT)
+        cases = [
+            (
+                'OUT total, last 15 days',
+                out.filter(created_at__date__gte=start, created_at__date__lte=end),
+                out.filter(**date_range_filter(start, end)),
+                lambda qs: qs.values('movement_type').annotate(s=Sum('quantity')),
+            ),
+            (
+                'movement list, first page',
+                StockMovement.objects.filter(created_at__date__gte=start, created_at__date__lte=end),
+                StockMovement.objects.filter(**date_range_filter(start, end)),
+                lambda qs: qs.order_by('-created_at')[:50],
+            ),
+            (
+                'one product, last 15 days',
+                StockMovement.objects.filter(product=product, created_at__date__gte=start, created_at__date__lte=end),
+                StockMovement.objects.filter(product=product, **date_range_filter(start, end)),
+                lambda qs: qs.order_by('-created_at')[:10],
+            ),
+        ]
+
+        for title, before, after, shape in cases:
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            for label, qs in (('before (__date)', before), ('after (half-open)', after)):
+                self.stdout.write(f'  {label}: {self._time(shape(qs), options["repeat"]):.1f} ms median')
+                for line in shape(qs).explain().splitlines():
+                    self.stdout.write(f'      {line}')
+
+        if not options['keep']:
+            with transaction.atomic():
+                StockMovement.objects.filter(product__in=products).delete()
+                Product.objects.filter(pk__in=[p.pk for p in products]).delete()
+
+    def _time(self, qs, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(qs.all())
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    def _seed(self, options):
+        tag = time.time_ns()
+        category, _ = Category.objects.get_or_create(
+            slug='bench-movements',
+            defaults={'category_name': 'Bench Movements', 'sku_prefix': 'BENCHMOV'},
+        )
+        products = Product.objects.bulk_create(
+            Product(
+                sku=f'BENCHMOV-{tag}-{i}',
+                product_name=f'Bench movements {tag}-{i}',
+                slug=f'bench-movements-{tag}-{i}',
+                price=100,
+                stock=0,
+                category=category,
+            )
+            for i in range(options['products'])
+        )
+
+        # Raw executemany: the ORM would spend most of the time building objects
+        table = StockMovement._meta.db_table
+        columns = ('product_id', 'movement_type', 'unit_price', 'quantity', 'balance_after',
+                   'ref_type', 'ref_no', 'remark', 'created_at')
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(table),
+            ', '.join(connection.ops.quote_name(c) for c in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+
+        rng = random.Random(42)
+        now = timezone.now()
+        span = options['days'] * 86400
+        ids = [p.pk for p in products]
+        adapt = connection.ops.adapt_datetimefield_value
+        batch = 50_000
+        started = time.perf_counter()
+        for offset in range(0, options['rows'], batch):
+            rows = [
+                (
+                    rng.choice(ids),
+                    StockMovement.IN if rng.random() < 0.5 else StockMovement.OUT,
+                    100,
+                    rng.randint(1, 10),
+                    0,
+                    '',
+                    '',
+                    '',
+                    adapt(now - timedelta(seconds=rng.randrange(span))),
+                )
+                for _ in range(min(batch, options['rows'] - offset))
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        self.stdout.write(f"Seeded {options['rows']} movements in {time.perf_counter() - started:.1f}s")
+        return products
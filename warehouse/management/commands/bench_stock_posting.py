@@ -0,0 +1,99 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+from category.models import Category
+from store.models import Product, StockMovement
+from warehouse.services import InsufficientStock, post_movement
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer one product with N parallel posting threads and report "
+        "postings/sec plus any drift between Product.stock and the movement log."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--postings', type=int, default=200, help='Postings per thread')
+        parser.add_argument('--opening', type=int, default=50, help='Opening stock of the bench product')
+        parser.add_argument('--keep', action='store_true', help='Keep the bench category and product afterwards')
+
+    def handle(self, *args, **options):
+        category, _ = Category.objects.get_or_create(
+            slug='bench-posting',
+            defaults={'category_name': 'Bench Posting', 'sku_prefix': 'BENCHPOST'},
+        )
+        # No QR code: nothing is written to MEDIA_ROOT
+        [product] = Product.objects.create_many([Product(
+            product_name=f'Bench posting {time.time_ns()}',
+            slug=f'bench-posting-{time.time_ns()}',
+            price=100,
+            stock=options['opening'],
+            category=category,
+        )], qr_codes=False)
+        try:
+            self.run(product, options)
+        finally:
+            if not options['keep']:
+                product.delete()
+                category.delete()
+
+    def run(self, product, options):
+        results = {'ok': 0, 'rejected': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def worker():
+            ok = rejected = failed = 0
+            rng = random.Random()
+            try:
+                for _ in range(options['postings']):
+                    action = rng.choice((StockMovement.IN, StockMovement.OUT))
+                    try:
+                        post_movement(Product(pk=product.pk), action, rng.randint(1, 5), ref_type='ADJ')
+                        ok += 1
+                    except InsufficientStock:
+                        rejected += 1
+                    except OperationalError:
+                        # gave up after MAX_RETRIES
+                        failed += 1
+            finally:
+                connection.close()
+            with lock:
+                results['ok'] += ok
+                results['rejected'] += rejected
+                results['failed'] += failed
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        movements = StockMovement.objects.filter(product=product)
+        sum_in = movements.filter(movement_type=StockMovement.IN).aggregate(s=Sum('quantity'))['s'] or 0
+        sum_out = movements.filter(movement_type=StockMovement.OUT).aggregate(s=Sum('quantity'))['s'] or 0
+        expected = options['opening'] + sum_in - sum_out
+        negative = movements.filter(balance_after__lt=0).exists()
+
+        self.stdout.write(f"threads={options['threads']} postings={results['ok']} rejected={results['rejected']} failed={results['failed']}")
+        self.stdout.write(f"elapsed={elapsed:.2f}s throughput={results['ok'] / elapsed:.0f} postings/sec")
+        self.stdout.write(f"stock={product.stock} expected={expected} drift={product.stock - expected}")
+        self.stdout.write(
+            f"ledger total_in={product.total_in}/{sum_in} total_out={product.total_out}/{sum_out} "
+            f"negative_balance={negative}"
+        )
+
+        drift = (product.stock != expected or product.total_in != sum_in
+                 or product.total_out != sum_out or negative)
+        if drift:
+            self.stderr.write(self.style.ERROR('Ledger drift detected'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No drift'))
@@ -0,0 +1,41 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from warehouse.importers import BATCH_SIZE, ImportFailed, import_movements
+
+
+class Command(BaseCommand):
+    help = "Bulk load stock movements from a CSV or JSON-lines file (all or nothing)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--user', help='Email of the account recorded as created_by')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.lower().endswith(('.jsonl', '.json')) else 'csv')
+
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No account with email {options['user']}")
+
+        started = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                count = import_movements(stream, fmt, created_by=user, batch_size=options['batch_size'])
+        except ImportFailed as exc:
+            for error in exc.errors:
+                self.stderr.write(error)
+            raise CommandError('Import aborted, nothing was posted.')
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {count} movements in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} rows/sec)'
+        ))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from warehouse.services import rebuild_daily_summary
+
+
+class Command(BaseCommand):
+    help = "Recompute the per product, per day stock rollup from the movement history."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_daily_summary()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} daily summary rows in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,105 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, iterable like a Paginator page."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Newest-first cursor pagination keyed on (created_at, id).
+
+    Each page is a range seek from the cursor instead of OFFSET, so page N
+    costs the same as page 1 and no COUNT(*) is needed to render it.
+    """
+
+    def __init__(self, queryset, per_page, field='created_at'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def get_page(self, cursor=None):
+        direction, value, pk = self._decode(cursor)
+        f = self.field
+
+        if direction == 'prev':
+            qs = self.queryset.filter(Q(**{f'{f}__gt': value}) | Q(**{f: value, 'pk__gt': pk}))
+            rows = list(qs.order_by(f, 'pk')[:self.per_page + 1])
+            if len(rows) <= self.per_page:
+                # back at the newest rows: serve a full first page instead
+                return self.get_page()
+            rows = rows[:self.per_page][::-1]
+            has_newer, has_older = True, True
+        else:
+            qs = self.queryset
+            if direction == 'next':
+                qs = qs.filter(Q(**{f'{f}__lt': value}) | Q(**{f: value, 'pk__lt': pk}))
+            rows = list(qs.order_by(f'-{f}', '-pk')[:self.per_page + 1])
+            has_older = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_newer = direction == 'next'
+
+        if not rows:
+            return KeysetPage([], None, None)
+        return KeysetPage(
+            rows,
+            self._encode('next', rows[-1]) if has_older else None,
+            self._encode('prev', rows[0]) if has_newer else None,
+        )
+
+    def _encode(self, direction, obj):
+        raw = f'{direction}|{getattr(obj, self.field).isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def _decode(self, cursor):
+        """Return (direction, value, pk); anything unreadable means the first page."""
+        if not cursor:
+            return None, None, None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            direction, value, pk = raw.split('|')
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None, None, None
+        if direction not in ('next', 'prev') or value is None:
+            return None, None, None
+        return direction, value, pk
+
+
+def capped_count(queryset, cap=10000):
+    """
+    Approximate size of a result set: exact up to cap, otherwise (cap, True).
+
+    Counting stops after cap + 1 rows, so huge ranges cost a bounded scan.
+    """
+    count = queryset.order_by()[:cap + 1].count()
+    if count > cap:
+        return cap, True
+    return count, False
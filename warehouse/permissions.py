@@ -1,7 +1,59 @@
 from django.contrib.auth.decorators import user_passes_test
+from django.core.cache import cache
 
+from chuefamily.cache import get_version
 
-def in_group(*group_names):
+WAREHOUSE_GROUP = 'Warehouse Staff'
+
+# Group memberships are invalidated by warehouse.signals; this only bounds
+# how long an entry of a user who stopped visiting lingers in the cache.
+GROUPS_CACHE_TIMEOUT = 60 * 60
+
+# Per-process copies for the current 'groups' version: {version: {user_pk: names}}
+_local = {}
+# Users kept in _local before it starts over
+LOCAL_MAX_USERS = 10000
+
+
+def group_names(user):
+    """
+    Names of the groups user belongs to, without a query on a warm cache.
+
+    Cached in-process and in the shared cache under the 'groups' namespace,
+    whose version is bumped whenever a membership changes or a group is
+    renamed or deleted. The bump reaches every worker only through a shared
+    cache; warehouse.checks refuses a per-process one. Inside a request the
+    version comes from the pinned versions, so a warm check runs no query of
+    its own.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, '_warehouse_group_names', None)
+    if names is None:
+        version = get_version('groups')
+        local = _local.get(version)
+        if local is None or len(local) >= LOCAL_MAX_USERS:
+            _local.clear()
+            local = _local.setdefault(version, {})
+        names = local.get(user.pk)
+        if names is None:
+            key = f'groups:{version}:{user.pk}'
+            names = cache.get(key)
+            if names is None:
+                names = frozenset(user.groups.values_list('name', flat=True))
+                cache.set(key, names, GROUPS_CACHE_TIMEOUT)
+            local[user.pk] = names
+        user._warehouse_group_names = names
+    return names
+
+
+def is_warehouse_staff(user):
+    return user.is_authenticated and (
+        user.is_superuser or user.is_staff or WAREHOUSE_GROUP in group_names(user)
+    )
+
+
+def in_group(*group_names_):
     def check(user):
-        return user.is_authenticated and (user.is_superuser or user.groups.filter(name__in=group_names).exists())
-    return user_passes_test(check)
\ No newline at end of file
+        return user.is_authenticated and (user.is_superuser or not group_names(user).isdisjoint(group_names_))
+    return user_passes_test(check)
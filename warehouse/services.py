@@ -0,0 +1,322 @@
+import random
+import time
+
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from chuefamily.cache import bump_version
+from store.models import (
+    Product, StockDailySummary, StockMovement, SupplierInvoice, SupplierInvoiceItem, stock_change_stamp,
+)
+
+# How often a posting is retried when the database reports lock contention
+# (SQLite "database is locked", Postgres serialization failure / deadlock).
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.02
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product, available, movement=None):
+        self.product = product
+        self.available = available
+        # the first movement of a bulk posting that would go negative
+        self.movement = movement
+        super().__init__(f'Not enough stock. Current stock is {available}')
+
+
+def _with_retries(func, *args):
+    """Run func(*args) in its own transaction, retrying on lock contention."""
+    # Retrying is only safe when we own the transaction.
+    in_outer_atomic = transaction.get_connection().in_atomic_block
+    attempts = 1 if in_outer_atomic else MAX_RETRIES
+
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return func(*args)
+        except OperationalError:
+            if attempt == attempts:
+                raise
+            time.sleep(RETRY_BACKOFF * attempt * (1 + random.random()))
+
+
+def post_movement(product, movement_type, quantity, unit_price=None, ref_type='', ref_no='', remark='', created_by=None,
+                  idempotency_key=None):
+    """
+    Record one stock movement and keep the product ledger in step.
+
+    Stock is changed with a single conditional UPDATE (stock >= qty for OUT),
+    so parallel scanners on the same SKU can neither lose updates nor drive
+    stock negative. The running balance is read back while the row is still
+    locked by that UPDATE and stamped on the movement.
+
+    A movement already posted under idempotency_key is returned as is
+    instead of being posted again, so a retried scan is harmless.
+    """
+    if idempotency_key:
+        existing = StockMovement.objects.filter(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing
+    try:
+        movement = _with_retries(
+            _post, product, movement_type, quantity, unit_price, ref_type, ref_no, remark, created_by,
+            idempotency_key,
+        )
+    except IntegrityError:
+        # a concurrent retry of the same scan won the unique key
+        existing = StockMovement.objects.filter(idempotency_key=idempotency_key).first() if idempotency_key else None
+        if existing is None:
+            raise
+        return existing
+    product.stock = movement.balance_after
+    return movement
+
+
+def _post(product, movement_type, quantity, unit_price, ref_type, ref_no, remark, created_by, idempotency_key):
+    rows = Product.objects.filter(pk=product.pk)
+
+    if movement_type == StockMovement.IN:
+        updated = rows.update(
+            stock=F('stock') + quantity, total_in=F('total_in') + quantity, modified_date=timezone.now(),
+            stock_stamp=stock_change_stamp(),
+        )
+    else:
+        updated = rows.filter(stock__gte=quantity).update(
+            stock=F('stock') - quantity, total_out=F('total_out') + quantity, modified_date=timezone.now(),
+            stock_stamp=stock_change_stamp(),
+        )
+
+    balance, price = rows.values_list('stock', 'price').get()
+    if not updated:
+        raise InsufficientStock(product, balance)
+
+    movement = StockMovement.objects.create(
+        product=product,
+        movement_type=movement_type,
+        quantity=quantity,
+        unit_price=price if unit_price is None else unit_price,
+        balance_after=balance,
+        ref_type=ref_type,
+        ref_no=ref_no,
+        remark=remark,
+        created_by=created_by,
+        idempotency_key=idempotency_key or None,
+    )
+    _roll_up([movement])
+    return movement
+
+
+def post_movements_bulk(movements, batch_size=1000):
+    """
+    Post many unsaved StockMovement objects in one go.
+
+    Net deltas are applied with one UPDATE per product, the resulting stock
+    is read back in a single query and the running balances are filled in
+    backwards from it before the rows are bulk inserted. Runs inside the
+    caller's transaction when there is one, otherwise opens its own. Raises
+    InsufficientStock (and posts nothing) if any running balance would go
+    negative.
+    """
+    if not movements:
+        return []
+
+    deltas = {}
+    for m in movements:
+        d = deltas.setdefault(m.product_id, {'in': 0, 'out': 0})
+        d['in' if m.movement_type == StockMovement.IN else 'out'] += m.quantity
+
+    with transaction.atomic():
+        for product_id in sorted(deltas):
+            d = deltas[product_id]
+            Product.objects.filter(pk=product_id).update(
+                stock=F('stock') + d['in'] - d['out'],
+                total_in=F('total_in') + d['in'],
+                total_out=F('total_out') + d['out'],
+                modified_date=timezone.now(),
+                stock_stamp=stock_change_stamp(),
+            )
+
+        return _insert_with_balances(movements, batch_size)
+
+
+def post_new_movements(movements, batch_size=1000):
+    """
+    post_movements_bulk() for client-keyed movements, skipping every one
+    whose idempotency key is already posted or repeated earlier in the list.
+
+    Returns (posted, ids): the movements actually inserted, and the movement
+    id of every idempotency key involved, old or new.
+    """
+    for attempt in (1, 2):
+        keys = {m.idempotency_key for m in movements if m.idempotency_key}
+        ids = dict(StockMovement.objects.filter(idempotency_key__in=keys).values_list('idempotency_key', 'pk'))
+
+        seen = set(ids)
+        new = []
+        for m in movements:
+            if m.idempotency_key:
+                if m.idempotency_key in seen:
+                    continue
+                seen.add(m.idempotency_key)
+            new.append(m)
+
+        try:
+            posted = post_movements_bulk(new, batch_size=batch_size)
+        except IntegrityError:
+            # a concurrent replay inserted some of these keys first; look again
+            if attempt == 2:
+                raise
+            continue
+        ids.update((m.idempotency_key, m.pk) for m in posted if m.idempotency_key)
+        return posted, ids
+
+
+def _insert_with_balances(movements, batch_size):
+    """
+    Bulk insert movements whose stock deltas are already applied (and whose
+    product rows are therefore locked by this transaction).
+    """
+    current = {
+        pk: (stock, price)
+        for pk, stock, price in (
+            Product.objects.filter(pk__in={m.product_id for m in movements}).values_list('id', 'stock', 'price')
+        )
+    }
+
+    # Walk backwards from the new stock so each row gets its balance_after
+    running = {pk: stock for pk, (stock, _) in current.items()}
+    for m in reversed(movements):
+        m.balance_after = running[m.product_id]
+        if m.unit_price is None:
+            m.unit_price = current[m.product_id][1]
+        running[m.product_id] -= m.quantity if m.movement_type == StockMovement.IN else -m.quantity
+
+    for m in movements:
+        if m.balance_after < 0:
+            raise InsufficientStock(m.product, m.balance_before, movement=m)
+
+    movements = StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+    _roll_up(movements)
+    return movements
+
+
+def _roll_up(movements):
+    """
+    Fold freshly inserted movements into StockDailySummary and invalidate
+    the cached reports once the transaction commits.
+    """
+    groups = {}
+    for m in movements:
+        row = groups.setdefault(
+            (m.product_id, timezone.localdate(m.created_at)),
+            {'qty_in': 0, 'qty_out': 0, 'value_in': 0, 'income': 0},
+        )
+        if m.movement_type == StockMovement.IN:
+            row['qty_in'] += m.quantity
+            row['value_in'] += m.quantity * m.unit_price
+        else:
+            row['qty_out'] += m.quantity
+            row['income'] += m.quantity * m.unit_price
+        row['closing_balance'] = m.balance_after
+
+    for (product_id, day), row in sorted(groups.items()):
+        increments = {
+            field: F(field) + row[field] for field in ('qty_in', 'qty_out', 'value_in', 'income')
+        }
+        summary = StockDailySummary.objects.filter(product_id=product_id, day=day)
+        if summary.update(closing_balance=row['closing_balance'], **increments):
+            continue
+        try:
+            with transaction.atomic():
+                StockDailySummary.objects.create(product_id=product_id, day=day, **row)
+        except IntegrityError:
+            # a concurrent posting created today's row first
+            summary.update(closing_balance=row['closing_balance'], **increments)
+
+    transaction.on_commit(lambda: bump_version('stock'))
+
+
+def rebuild_daily_summary():
+    """Recompute StockDailySummary from the full movement history."""
+    with transaction.atomic():
+        StockDailySummary.objects.all().delete()
+        rows = {}
+        movements = StockMovement.objects.order_by('product_id', 'created_at', 'id').only(
+            'product_id', 'created_at', 'movement_type', 'quantity', 'unit_price', 'balance_after'
+        )
+        for m in movements.iterator(chunk_size=5000):
+            key = (m.product_id, timezone.localdate(m.created_at))
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = StockDailySummary(product_id=m.product_id, day=key[1])
+            if m.movement_type == StockMovement.IN:
+                row.qty_in += m.quantity
+                row.value_in += m.quantity * m.unit_price
+            else:
+                row.qty_out += m.quantity
+                row.income += m.quantity * m.unit_price
+            row.closing_balance = m.balance_after
+        StockDailySummary.objects.bulk_create(rows.values(), batch_size=1000)
+    transaction.on_commit(lambda: bump_version('stock'))
+    return len(rows)
+
+
+def post_invoice(invoice, posted_by=None):
+    """
+    Turn a DRAFT supplier invoice into stock IN movements.
+
+    The invoice is claimed with a conditional status UPDATE, so posting is
+    idempotent: a second call (or a concurrent one) finds nothing to claim
+    and returns an empty list. Stock for every line is raised with one
+    set-based UPDATE driven by the invoice items.
+    """
+    posted_at, movements = _with_retries(_post_invoice, invoice, posted_by)
+    if posted_at:
+        invoice.status = SupplierInvoice.POSTED
+        invoice.posted_at = posted_at
+    return movements
+
+
+def _post_invoice(invoice, posted_by):
+    posted_at = timezone.now()
+    claimed = (
+        SupplierInvoice.objects
+        .filter(pk=invoice.pk, status=SupplierInvoice.DRAFT)
+        .update(status=SupplierInvoice.POSTED, posted_at=posted_at)
+    )
+    if not claimed:
+        return None, []
+
+    items = SupplierInvoiceItem.objects.filter(invoice_id=invoice.pk)
+    line_qty = Subquery(
+        items.filter(product=OuterRef('pk'))
+        .values('product')
+        .annotate(s=Sum('quantity'))
+        .values('s')
+    )
+    Product.objects.filter(pk__in=items.values('product')).update(
+        stock=F('stock') + line_qty,
+        total_in=F('total_in') + line_qty,
+        modified_date=posted_at,
+        stock_stamp=stock_change_stamp(),
+    )
+
+    movements = [
+        StockMovement(
+            product_id=product_id,
+            movement_type=StockMovement.IN,
+            quantity=quantity,
+            # valued at what the supplier charged, not the selling price
+            unit_price=unit_cost,
+            ref_type='SUP_INV',
+            ref_no=invoice.inv_no,
+            created_by=posted_by,
+        )
+        for product_id, quantity, unit_cost in (
+            items.order_by('id').values_list('product_id', 'quantity', 'unit_cost')
+        )
+    ]
+    if not movements:
+        return posted_at, []
+    return posted_at, _insert_with_balances(movements, batch_size=1000)
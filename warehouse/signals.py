@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from chuefamily.cache import bump_version
+
+
+def _invalidate_groups():
+    # Now, so the next request sees the change, and again on commit, in case
+    # a request cached the old memberships before the transaction landed
+    bump_version('groups')
+    transaction.on_commit(lambda: bump_version('groups'))
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def invalidate_group_memberships(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidate_groups()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_names(sender, **kwargs):
+    _invalidate_groups()
@@ -0,0 +1,39 @@
+"""
+Commit-ordered change stamps for the offline sync endpoint.
+
+Movement ids are allocated on insert, not on commit, so on PostgreSQL a
+lower id can become visible after a higher one and a "highest id seen"
+watermark would skip it for good. Instead every stock change stamps the
+product row, and a device is handed a watermark below which every stamp
+is already committed:
+
+- PostgreSQL stamps the writing transaction's id, and the watermark is
+  the oldest transaction still running (the snapshot xmin).
+- SQLite has a single writer, so a counter bumped inside the stock
+  UPDATE, i.e. under the write lock, is in commit order already.
+
+Stamps come from store.models.stock_change_stamp(), written by every
+posting in warehouse.services and by Product.save / create_many for new
+products and edited stock. A delta is every product stamped at or above
+the old watermark. Changes that commit while it is read are reported
+again next time, never missed.
+"""
+from django.db import connection
+
+from store.models import Product
+
+
+def watermark():
+    """Lowest stamp that may belong to a change not visible yet."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        else:
+            table = connection.ops.quote_name(Product._meta.db_table)
+            cursor.execute(f'SELECT COALESCE(MAX(stock_stamp), 0) + 1 FROM {table}')
+        return cursor.fetchone()[0]
+
+
+def changed_since(stamp):
+    """Products whose stock changed at or after watermark stamp."""
+    return Product.objects.filter(stock_stamp__gte=stamp)
@@ -1,3 +1,372 @@
-from django.test import TestCase
+import re
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Account
+from category.models import Category
+from chuefamily.cache import get_version, pinned_versions
+from store.models import Product, StockMovement, Supplier, SupplierInvoice, SupplierInvoiceItem
+from store.tests import TEST_STORAGES
+from .checks import check_shared_cache
+from .exports import COLUMNS, stream_xlsx
+from .importers import ImportFailed, import_movements
+from .labels import LABELS_PER_PAGE, qr_svg_path, stream_html_sheet
+from .pagination import KeysetPaginator
+from .permissions import WAREHOUSE_GROUP, is_warehouse_staff
+from .services import InsufficientStock, post_invoice, post_movement, post_movements_bulk
+from .utils import parse_sku_prefix, sku_prefix_filter
+
+
+class WarehouseStaffCacheTests(TestCase):
+    """
+    Group membership is cached, so authorizing a warehouse request costs no
+    queries beyond the request's read of the cache versions. Run against the
+    configured (database) cache.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name=WAREHOUSE_GROUP)
+        self.user = Account.objects.create_user(
+            first_name='Scan', last_name='Gun', username='scan', email='scan@example.com', password='pw',
+        )
+
+    def fresh_user(self):
+        # A new object per check, like request.user on every request
+        return Account.objects.get(pk=self.user.pk)
+
+    def test_membership_is_cached(self):
+        self.user.groups.add(self.group)
+        self.assertTrue(is_warehouse_staff(self.fresh_user()))
+        user = self.fresh_user()
+        with pinned_versions():
+            get_version('groups')  # read once per request, with the other versions
+            with self.assertNumQueries(0):
+                self.assertTrue(is_warehouse_staff(user))
+
+    def test_membership_changes_invalidate(self):
+        self.assertFalse(is_warehouse_staff(self.fresh_user()))
+        self.user.groups.add(self.group)
+        self.assertTrue(is_warehouse_staff(self.fresh_user()))
+        self.group.user_set.remove(self.user)
+        self.assertFalse(is_warehouse_staff(self.fresh_user()))
+
+    def test_group_rename_invalidates(self):
+        self.user.groups.add(self.group)
+        self.assertTrue(is_warehouse_staff(self.fresh_user()))
+        self.group.name = 'Former Staff'
+        self.group.save()
+        self.assertFalse(is_warehouse_staff(self.fresh_user()))
+
+    def test_per_process_cache_is_refused(self):
+        # revocations would only reach the worker that made them
+        self.assertEqual(check_shared_cache(None), [])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['warehouse.E001'])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class LedgerTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        self.product = Product.objects.create(
+            product_name='Shoe', slug='shoe', images='photos/products/shoe.jpg', price=10, stock=0, category=category,
+        )
+
+    def assert_ledger(self, stock, total_in, total_out):
+        self.product.refresh_from_db()
+        self.assertEqual(
+            (self.product.stock, self.product.total_in, self.product.total_out), (stock, total_in, total_out),
+        )
+
+    def test_postings_maintain_totals_and_balances(self):
+        post_movement(self.product, StockMovement.IN, 5)
+        post_movement(self.product, StockMovement.OUT, 2)
+        self.assert_ledger(3, 5, 2)
+
+        post_movements_bulk([
+            StockMovement(product=self.product, movement_type=StockMovement.IN, quantity=4),
+            StockMovement(product=self.product, movement_type=StockMovement.OUT, quantity=1),
+        ])
+        self.assert_ledger(6, 9, 3)
+        balances = StockMovement.objects.order_by('id').values_list('balance_after', flat=True)
+        self.assertEqual(list(balances), [5, 3, 7, 6])
+
+    def test_insufficient_stock_changes_nothing(self):
+        post_movement(self.product, StockMovement.IN, 3)
+        with self.assertRaises(InsufficientStock) as raised:
+            post_movement(self.product, StockMovement.OUT, 4)
+        self.assertEqual(raised.exception.available, 3)
+        with self.assertRaises(InsufficientStock):
+            post_movements_bulk([
+                StockMovement(product=self.product, movement_type=StockMovement.OUT, quantity=2),
+                StockMovement(product=self.product, movement_type=StockMovement.OUT, quantity=2),
+            ])
+        self.assert_ledger(3, 3, 0)
+        self.assertEqual(StockMovement.objects.count(), 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ImportTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        self.product = Product.objects.create(
+            product_name='Shoe', slug='shoe', images='photos/products/shoe.jpg', price=10, stock=0, category=category,
+        )
+
+    def assert_nothing_posted(self):
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.total_in), (0, 0))
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_bad_row_rolls_back_earlier_batches(self):
+        sku = self.product.sku
+        stream = StringIO(f'sku,action,quantity\n{sku},IN,5\n{sku},IN,2\nNOPE,IN,1\n')
+        with self.assertRaises(ImportFailed) as raised:
+            import_movements(stream, 'csv', batch_size=1)
+        self.assertEqual(raised.exception.errors, ['Line 4: unknown SKU "NOPE"'])
+        self.assert_nothing_posted()
+
+    def test_negative_stock_rolls_back_the_file(self):
+        sku = self.product.sku
+        stream = StringIO(
+            f'{{"sku": "{sku}", "action": "IN", "quantity": 5}}\n'
+            f'{{"sku": "{sku}", "action": "OUT", "quantity": 6}}\n'
+        )
+        with self.assertRaises(ImportFailed):
+            import_movements(stream, 'jsonl', batch_size=1)
+        self.assert_nothing_posted()
+
+    def test_import(self):
+        stream = StringIO(f'sku,action,quantity,unit_price\n{self.product.sku},IN,5,7\n')
+        self.assertEqual(import_movements(stream, 'csv'), 1)
+        self.assertEqual(StockMovement.objects.get().unit_price, 7)
+
+
+class SkuPrefixTests(TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_sku_prefix(' fw-000 '), 'FW-000')
+        self.assertEqual(parse_sku_prefix('FW-'), 'FW-')
+        # a scanned QR payload
+        self.assertEqual(parse_sku_prefix('CHUE|FW-00012'), 'FW-00012')
+        self.assertEqual(parse_sku_prefix('chue|fw-0001'), 'FW-0001')
+        for text in ('running shoe', 'FW', 'CHUE|', 'CHUE|FW', 'FW-12A', 'XCHUE|FW-1'):
+            self.assertIsNone(parse_sku_prefix(text), text)
+
+    def test_range_upper_bound(self):
+        self.assertEqual(sku_prefix_filter('FW-0001'), {'sku__gte': 'FW-0001', 'sku__lt': 'FW-0002'})
+        self.assertEqual(sku_prefix_filter('FW-0009'), {'sku__gte': 'FW-0009', 'sku__lt': 'FW-000:'})
+        self.assertEqual(sku_prefix_filter('FW-'), {'sku__gte': 'FW-', 'sku__lt': 'FW.'})
+
+    @override_settings(STORAGES=TEST_STORAGES, QR_CODE_WORKERS=0)
+    def test_range_matches_startswith(self):
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        for sku in ('FW-00009', 'FW-00010', 'FW-00019', 'FW-00020', 'FW-0001', 'FW-1', 'FX-00010', 'FW'):
+            Product.objects.create(product_name=sku, slug=sku.lower(), sku=sku, price=1, stock=0, category=category)
+        for prefix in ('FW-0001', 'FW-0000', 'FW-', 'FW-1', 'FW-00020'):
+            expected = set(Product.objects.filter(sku__startswith=prefix).values_list('sku', flat=True))
+            found = set(Product.objects.filter(**sku_prefix_filter(prefix)).values_list('sku', flat=True))
+            self.assertEqual(found, expected, prefix)
+
+    def test_postgresql_uses_like(self):
+        with mock.patch('warehouse.utils.connection') as connection:
+            connection.vendor = 'postgresql'
+            self.assertEqual(sku_prefix_filter('FW-0001'), {'sku__startswith': 'FW-0001'})
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        product = Product.objects.create(
+            product_name='Shoe', slug='shoe', images='photos/products/shoe.jpg', price=10, stock=0, category=category,
+        )
+        for _ in range(5):
+            post_movement(product, StockMovement.IN, 1)
+        # a bulk import stamps many rows with the same created_at; the id breaks the tie
+        StockMovement.objects.update(created_at=timezone.now())
+        self.ids = list(StockMovement.objects.order_by('-id').values_list('id', flat=True))
+        self.paginator = KeysetPaginator(StockMovement.objects.all(), 2)
+
+    def ids_of(self, page):
+        return [movement.pk for movement in page]
+
+    def test_next_and_previous_across_ties(self):
+        first = self.paginator.get_page()
+        self.assertEqual(self.ids_of(first), self.ids[:2])
+        self.assertFalse(first.has_previous)
+
+        second = self.paginator.get_page(first.next_cursor)
+        self.assertEqual(self.ids_of(second), self.ids[2:4])
+        last = self.paginator.get_page(second.next_cursor)
+        self.assertEqual(self.ids_of(last), self.ids[4:])
+        self.assertFalse(last.has_next)
+
+        back = self.paginator.get_page(last.previous_cursor)
+        self.assertEqual(self.ids_of(back), self.ids[2:4])
+        newest = self.paginator.get_page(back.previous_cursor)
+        self.assertEqual(self.ids_of(newest), self.ids[:2])
+        self.assertFalse(newest.has_previous)
+
+    def test_unreadable_cursor_is_the_first_page(self):
+        self.assertEqual(self.ids_of(self.paginator.get_page('not a cursor')), self.ids[:2])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class MovementTotalsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        self.product = Product.objects.create(
+            product_name='Shoe', slug='shoe', images='photos/products/shoe.jpg', price=10, stock=0, category=category,
+        )
+        post_movement(self.product, StockMovement.IN, 5, unit_price=7)
+        post_movement(self.product, StockMovement.OUT, 2, unit_price=20)
+        user = Account.objects.create_superuser(
+            first_name='Ware', last_name='House', username='admin', email='admin@example.com', password='pw',
+        )
+        self.client.force_login(user)
+
+    def test_movement_list_totals(self):
+        today = timezone.localdate().isoformat()
+        # a single day is aggregated from the movements, an open range from the daily rollup
+        for data in ({'start': today, 'end': today}, {}):
+            response = self.client.get(reverse('warehouse_movements'), data)
+            self.assertEqual(
+                [response.context[name] for name in ('total_in', 'total_out', 'value_in', 'value_out')],
+                [5, 2, 35, 40],
+            )
+
+    def test_scan_totals(self):
+        response = self.client.get(reverse('warehouse_scan', args=[self.product.sku]))
+        self.assertEqual(response.context['net_total'], 3)
+
+    def test_resubmitted_scan_is_posted_once(self):
+        url = reverse('warehouse_scan', args=[self.product.sku])
+        key = self.client.get(url).context['form_values']['idempotency_key']
+        data = {'action': 'IN', 'quantity': 4, 'idempotency_key': key}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class InvoicePostingTests(TestCase):
+    def test_lines_are_valued_at_unit_cost(self):
+        category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        product = Product.objects.create(
+            product_name='Shoe', slug='shoe', images='photos/products/shoe.jpg', price=10, stock=1, category=category,
+        )
+        invoice = SupplierInvoice.objects.create(supplier=Supplier.objects.create(name='Mill'), inv_no='SI-1')
+        SupplierInvoiceItem.objects.create(invoice=invoice, product=product, quantity=3, unit_cost=7)
+
+        [movement] = post_invoice(invoice)
+        self.assertEqual((movement.quantity, movement.unit_price, movement.balance_after), (3, 7, 4))
+        self.assertEqual(post_invoice(invoice), [])
+        self.assertEqual(StockMovement.objects.get().unit_price, 7)
+
+
+class XlsxExportTests(TestCase):
+    def test_rows_past_the_sheet_limit_continue_on_new_sheets(self):
+        rows = [
+            ('2026-10-17 09:00:00', f'FW-{i}', 'Shoe', 'Footwear', 'IN', 1, 7, 7, i, 'ADJ', '', 'bad\x0bchar', '')
+            for i in range(5)
+        ]
+        workbook = zipfile.ZipFile(BytesIO(b''.join(stream_xlsx(iter(rows), max_rows=3))))
+        names = [sheet.get('name') for sheet in ElementTree.fromstring(workbook.read('xl/workbook.xml'))[0]]
+        self.assertEqual(names, ['Movements', 'Movements 2', 'Movements 3'])
+
+        ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        skus = []
+        for n in (1, 2, 3):
+            sheet = ElementTree.fromstring(workbook.read(f'xl/worksheets/sheet{n}.xml'))
+            texts = [[t.text for t in row.iterfind('.//x:t', ns)] for row in sheet.iterfind('.//x:row', ns)]
+            self.assertEqual(texts[0], list(COLUMNS))
+            skus += [row[1] for row in texts[1:]]
+            self.assertTrue(all('badchar' in row for row in texts[1:]))
+        self.assertEqual(skus, [row[1] for row in rows])
+
+
+@override_settings(STORAGES=TEST_STORAGES, QR_CODE_WORKERS=0)
+class LabelTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(category_name='Footwear', slug='footwear', sku_prefix='FW')
+        other = Category.objects.create(category_name='Bags', slug='bags', sku_prefix='BG')
+        self.products = [
+            Product.objects.create(
+                product_name=f'Shoe {i}', slug=f'shoe-{i}', sku=f'FW-0000{i}', price=1500 * i, stock=0,
+                category=self.category,
+            )
+            for i in (1, 2, 3)
+        ]
+        Product.objects.create(product_name='Tote', slug='tote', sku='BG-00001', price=9, stock=0, category=other)
+        user = Account.objects.create_superuser(
+            first_name='Ware', last_name='House', username='admin', email='admin@example.com', password='pw',
+        )
+        self.client.force_login(user)
+
+    def labels(self, data, content_type='text/html; charset=utf-8'):
+        response = self.client.get(reverse('warehouse_print_labels'), data)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], content_type)
+        content = b''.join(response.streaming_content).decode()
+        return re.findall(r'font-family="monospace">([^<]+)</text>', content), content
+
+    def test_listed_skus(self):
+        skus, content = self.labels({'sku': ['FW-00003, FW-00001', 'BG-00001']})
+        self.assertEqual(skus, ['BG-00001', 'FW-00001', 'FW-00003'])
+        self.assertIn('MMK 1,500', content)
+        self.assertIn(f'<path d="{qr_svg_path("FW-00001")[1]}"/>', content)
+
+    def test_category(self):
+        skus, _ = self.labels({'category': self.category.pk})
+        self.assertEqual(skus, ['FW-00001', 'FW-00002', 'FW-00003'])
+
+    def test_invoice_prints_a_label_per_unit(self):
+        invoice = SupplierInvoice.objects.create(supplier=Supplier.objects.create(name='Mill'), inv_no='SI-1')
+        SupplierInvoiceItem.objects.create(invoice=invoice, product=self.products[1], quantity=2, unit_cost=7)
+        SupplierInvoiceItem.objects.create(invoice=invoice, product=self.products[0], quantity=1, unit_cost=7)
+        skus, content = self.labels({'invoice': 'SI-1', 'copies': 5})
+        self.assertEqual(skus, ['FW-00002', 'FW-00002', 'FW-00001'])
+        self.assertIn('<title>Labels SI-1</title>', content)
+
+    def test_copies(self):
+        for copies, expected in (('3', 3), ('0', 1), ('-2', 1), ('two', 1), ('', 1), ('500', 100)):
+            skus, _ = self.labels({'sku': 'FW-00002', 'copies': copies})
+            self.assertEqual(skus, ['FW-00002'] * expected, copies)
+
+    def test_svg_document_is_sized_for_its_pages(self):
+        skus, content = self.labels({'category': self.category.pk, 'copies': 9, 'format': 'svg'}, 'image/svg+xml')
+        self.assertEqual(len(skus), 27)
+        document = ElementTree.fromstring(content)
+        self.assertEqual(document.get('height'), '594mm')
+        pages = document.findall('{http://www.w3.org/2000/svg}g')
+        self.assertEqual([len(page) for page in pages], [LABELS_PER_PAGE, 27 - LABELS_PER_PAGE])
+
+    def test_nothing_selected(self):
+        response = self.client.get(reverse('warehouse_print_labels'))
+        self.assertRedirects(response, reverse('warehouse_products'), fetch_redirect_response=False)
+
+    def test_sheet_is_built_as_it_is_read(self):
+        consumed = []
+
+        def rows():
+            for i in range(3 * LABELS_PER_PAGE):
+                consumed.append(i)
+                yield f'FW-{i:05}', 'Shoe', 10
+
+        with mock.patch('warehouse.labels.CHUNK_SIZE', 5):
+            sheet = stream_html_sheet(rows())
+            next(sheet)  # <head>
+            self.assertEqual(consumed, [])
+            next(sheet)  # the first page
+            self.assertEqual(len(consumed), 25)
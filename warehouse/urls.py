@@ -6,6 +6,9 @@ urlpatterns = [
     path('products/', views.product_list, name='warehouse_products'),
     path('products/<str:sku>/', views.product_detail, name='warehouse_product_detail'),
     path('products/<str:sku>/print/', views.print_qr, name='warehouse_print_qr'),
+    path('labels/', views.print_labels, name='warehouse_print_labels'),
     path('scan/<str:sku>/', views.scan, name='warehouse_scan'),
     path('movements/', views.movement_list, name='warehouse_movements'),
+    path('movements/export/', views.movement_export, name='warehouse_movement_export'),
+    path('movements/import/', views.movement_import, name='warehouse_movement_import'),
 ]
\ No newline at end of file
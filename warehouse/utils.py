@@ -0,0 +1,55 @@
+import re
+from datetime import datetime, time, timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+# What a scan gun or a typed lookup looks like: FW-000, FW-00012, CHUE|FW-00012
+SKU_SHAPED = re.compile(r'^(?:CHUE\|)?([A-Z0-9]+-\d*)$')
+
+
+def day_range(start_date=None, end_date=None):
+    """
+    Convert an inclusive local date range into a half-open, timezone-aware
+    datetime range [start 00:00, day after end 00:00).
+
+    Filtering created_at against plain datetimes keeps the column bare, so
+    the (…, created_at) indexes can be used; created_at__date wraps it in a
+    cast on every backend. Either bound may be None.
+    """
+    start = end = None
+    if start_date:
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+    if end_date:
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+def date_range_filter(start_date=None, end_date=None, field='created_at'):
+    """Queryset filter kwargs for day_range(); empty when no bounds are set."""
+    start, end = day_range(start_date, end_date)
+    kwargs = {}
+    if start:
+        kwargs[f'{field}__gte'] = start
+    if end:
+        kwargs[f'{field}__lt'] = end
+    return kwargs
+
+
+def parse_sku_prefix(keyword):
+    """Return the SKU prefix keyword stands for, or None for free text."""
+    match = SKU_SHAPED.match(keyword.strip().upper())
+    return match.group(1) if match else None
+
+
+def sku_prefix_filter(prefix):
+    """
+    Queryset filter kwargs for SKUs starting with prefix that an index can serve.
+
+    SQLite only uses an index for LIKE under a NOCASE collation, so there the
+    prefix becomes a range on the unique sku index; PostgreSQL uses LIKE
+    against the varchar_pattern_ops index (store migration 0007).
+    """
+    if connection.vendor == 'sqlite':
+        return {'sku__gte': prefix, 'sku__lt': prefix[:-1] + chr(ord(prefix[-1]) + 1)}
+    return {'sku__startswith': prefix}
@@ -1,27 +1,40 @@
 from django.shortcuts import render, get_object_or_404,redirect
-from django.db.models import Sum, Q, Case, When, IntegerField, F, ExpressionWrapper
-from django.db.models.functions import TruncDate
-from store.models import Product, StockMovement
+from django.db.models import F, Sum, Count, Q
+from django.db.models.expressions import RawSQL
+from store.models import Product, StockDailySummary, StockMovement, SupplierInvoice
+from store import search as search_index, thumbnails
 from category.models import Category
-from .permissions import in_group
+from .permissions import in_group, is_warehouse_staff
+from .services import InsufficientStock, post_movement
+from .importers import FIELDS as IMPORT_FIELDS, ImportFailed, import_movements
+from .utils import date_range_filter, parse_sku_prefix, sku_prefix_filter
+from .pagination import KeysetPaginator, capped_count
+from .labels import CHUNK_SIZE as LABEL_CHUNK_SIZE, stream_html_sheet, stream_svg_sheet
+from .exports import movement_rows, stream_csv, stream_xlsx
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.cache import cache
+from chuefamily.cache import versioned_key
 from django.core.paginator import Paginator
 from django.contrib import messages
+from django.http import StreamingHttpResponse
 from django.utils.dateparse import parse_date
 from django.utils import timezone
 from datetime import timedelta
+import io
+import time
+import uuid
 # Create your views here.
 
-def is_warehouse_staff(user):
-    return user.is_superuser or user.is_staff or user.groups.filter(name='Warehouse Staff').exists()
+# Stock postings bump the cache version; the timeout only bounds product edits
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Upper bound for one label sheet
+MAX_LABELS = 20000
 
 @login_required
 @user_passes_test(is_warehouse_staff)
 # @in_group('Warehouse Staff')
 def dashboard(request):
-    total_products = Product.objects.count()
-    total_stock = Product.objects.aggregate(total=Sum('stock'))['total'] or 0
-
     # ---- Date range (default last 15 days) ----
     start_str = (request.GET.get('start') or '').strip()
     end_str = (request.GET.get('end') or '').strip()
@@ -34,14 +47,24 @@ def dashboard(request):
     if start_date and end_date and start_date > end_date:
         start_date, end_date = end_date, start_date
 
-    movements_range = StockMovement.objects.filter(created_at__date__gte=start_date, created_at__date__lte=end_date)
+    # Charts are served from the daily rollup and cached until the next posting
+    key = versioned_key('stock', 'dashboard', start_date, end_date)
+    context = cache.get(key)
+    if context is None:
+        context = _dashboard_context(start_date, end_date)
+        cache.set(key, context, DASHBOARD_CACHE_TIMEOUT)
+    return render(request, 'warehouse/dashboard.html', context)
+
+
+def _dashboard_context(start_date, end_date):
+    totals = Product.objects.aggregate(count=Count('id'), stock=Sum('stock'))
+    summary_range = StockDailySummary.objects.filter(day__gte=start_date, day__lte=end_date, qty_out__gt=0)
 
     # ---- Horizontal bar: Top OUT products by quantity (within range) ----
     top_out = (
-        movements_range
-        .filter(movement_type=StockMovement.OUT)
+        summary_range
         .values('product__product_name')
-        .annotate(qty_out=Sum('quantity'))
+        .annotate(qty_out=Sum('qty_out'))
         .order_by('-qty_out')[:10]
     )
     bar_labels = [r['product__product_name'] for r in top_out]
@@ -49,14 +72,9 @@ def dashboard(request):
 
     # ---- Line chart: Daily OUT quantity + daily OUT income (qty * unit_price) ----
     daily = (
-        movements_range
-        .filter(movement_type=StockMovement.OUT)
-        .annotate(day=TruncDate('created_at'))
+        summary_range
         .values('day')
-        .annotate(
-            qty_out=Sum('quantity'),
-            income=Sum(ExpressionWrapper(F('quantity') * F('unit_price'), output_field=IntegerField())),
-        )
+        .annotate(qty_out=Sum('qty_out'), income=Sum('income'))
         .order_by('day')
     )
 
@@ -64,9 +82,9 @@ def dashboard(request):
     line_qty = [d['qty_out'] or 0 for d in daily]
     line_income = [d['income'] or 0 for d in daily]
 
-    context = {
-        'total_products': total_products,
-        'total_stock': total_stock,
+    return {
+        'total_products': totals['count'],
+        'total_stock': totals['stock'] or 0,
 
         # date range
         'start': start_date.strftime('%Y-%m-%d') if start_date else '',
@@ -81,7 +99,6 @@ def dashboard(request):
         'line_qty': line_qty,
         'line_income': line_income,
     }
-    return render(request, 'warehouse/dashboard.html', context)
 
 @login_required
 @user_passes_test(is_warehouse_staff)
@@ -89,13 +106,21 @@ def dashboard(request):
 def product_list(request):
     products = Product.objects.all().order_by('-created_at')
     
-    keyword = request.GET.get('keyword','')
-    if keyword:
-        products = products.filter(
-            Q(product_name__icontains = keyword)|
-            Q(sku__icontains = keyword) |
-            Q(category__category_name__icontains=keyword)
+    keyword = request.GET.get('keyword','').strip()
+    sku_prefix = parse_sku_prefix(keyword) if keyword else None
+    if sku_prefix:
+        # Scan gun / SKU lookups: an index range instead of a full scan
+        products = products.filter(**sku_prefix_filter(sku_prefix))
+    elif keyword:
+        # Resolve category names to ids up front instead of joining per row
+        category_ids = list(
+            Category.objects.filter(category_name__icontains=keyword).values_list('id', flat=True)
         )
+        if search_index.supported():
+            text_match = Q(pk__in=RawSQL(*search_index.match_sql(keyword)))
+        else:
+            text_match = Q(product_name__icontains=keyword) | Q(sku__icontains=keyword)
+        products = products.filter(text_match | Q(category_id__in=category_ids))
     stock_filter = (request.GET.get('stock') or '').strip()
     # Sometimes links may include stock=None; treat it as empty
     if stock_filter.lower() == 'none':
@@ -123,6 +148,7 @@ def product_list(request):
     
     context = {
         'products': page_obj,
+        'thumbnail_manifests': thumbnails.lookup_many(p.images.name for p in page_obj),
         'categories': categories, 
         'keyword': keyword,
         'stock_filter': stock_filter,
@@ -135,41 +161,21 @@ def product_list(request):
 # @in_group('Warehouse Staff')
 def product_detail(request, sku):
     product = get_object_or_404(Product, sku=sku)
-    # Daily stock movement summary last 30 days
-    daily_movements = (
-        StockMovement.objects
+    # Daily stock movement summary last 30 days, straight from the rollup
+    daily_movements = list(
+        StockDailySummary.objects
         .filter(product=product)
-        .annotate(day=TruncDate('created_at'))
-        .values('day')
-        .annotate(
-            qty_in=Sum(
-                Case(
-                    When(
-                        movement_type=StockMovement.IN, then='quantity'),
-                        default=0,
-                        output_field=IntegerField(),
-                )
-            ),
-            qty_out = Sum(
-                Case(When(
-                    movement_type=StockMovement.OUT, then='quantity'),
-                    default=0,
-                    output_field=IntegerField(),
-                )
-            )
-        ).order_by('-day')
+        .order_by('-day')
+        .values('day', 'qty_in', 'qty_out', 'closing_balance')[:30]
     )
-    # optional limit rows displayed
-    daily_movements = daily_movements[:30]
-    daily_movements = list(daily_movements[:30])
     #Calulate net (net-out)
     for row in daily_movements:
-        qty_in = row.get('qty_in') or 0
-        qty_out = row.get('qty_out') or 0
-        row['net'] = qty_in - qty_out
+        row['net'] = row['qty_in'] - row['qty_out']
     context = {
         'product': product,
         'daily_movements': daily_movements,
+        'total_in': product.total_in,
+        'total_out': product.total_out,
     }
     return render(request, 'warehouse/product_detail.html', context)
 
@@ -184,6 +190,62 @@ def print_qr(request, sku):
     return render(request, 'warehouse/print_qr.html', context)
 
 
+@login_required
+@user_passes_test(is_warehouse_staff)
+def print_labels(request):
+    """
+    Stream a print-ready sheet of QR labels for a batch of products.
+
+    /warehouse/labels/?sku=FW-00001,FW-00002   listed SKUs
+    /warehouse/labels/?category=3             a whole category
+    /warehouse/labels/?invoice=INV-0001       one label per unit received
+    &copies=N repeats every label (not for invoices), &format=svg returns an
+    SVG document instead of an HTML page.
+    """
+    skus = [sku for value in request.GET.getlist('sku') for sku in value.replace(',', ' ').split()]
+    category_id = (request.GET.get('category') or '').strip()
+    inv_no = (request.GET.get('invoice') or '').strip()
+    copies = request.GET.get('copies', '1')
+    copies = min(int(copies), 100) if copies.isdigit() and int(copies) > 0 else 1
+
+    if inv_no:
+        invoice = get_object_or_404(SupplierInvoice, inv_no=inv_no)
+        items = invoice.items.order_by('id').values_list(
+            'product__sku', 'product__product_name', 'product__price', 'quantity'
+        )
+        count = items.aggregate(total=Sum('quantity'))['total'] or 0
+        rows = (
+            (sku, name, price)
+            for sku, name, price, quantity in items.iterator(chunk_size=LABEL_CHUNK_SIZE)
+            for _ in range(quantity)
+        )
+        title = f'Labels {invoice.inv_no}'
+    elif skus or category_id.isdigit():
+        products = Product.objects.order_by('sku')
+        products = products.filter(sku__in=skus) if skus else products.filter(category_id=int(category_id))
+        count = products.count() * copies
+        rows = (
+            row
+            for row in products.values_list('sku', 'product_name', 'price').iterator(chunk_size=LABEL_CHUNK_SIZE)
+            for _ in range(copies)
+        )
+        title = 'Labels'
+    else:
+        messages.error(request, 'Choose SKUs, a category or a supplier invoice to print labels for.')
+        return redirect('warehouse_products')
+
+    if count > MAX_LABELS:
+        messages.error(request, f'{count} labels requested; print at most {MAX_LABELS} at a time.')
+        return redirect('warehouse_products')
+
+    if request.GET.get('format') == 'svg':
+        response = StreamingHttpResponse(stream_svg_sheet(rows, count), content_type='image/svg+xml')
+        response['Content-Disposition'] = 'inline; filename="labels.svg"'
+    else:
+        response = StreamingHttpResponse(stream_html_sheet(rows, title), content_type='text/html; charset=utf-8')
+    return response
+
+
 
 
 
@@ -202,6 +264,8 @@ def scan(request, sku):
         'ref_type': '',
         'ref_no': '',
         'remark': '',
+        # one key per rendered form, so a resubmitted POST is posted only once
+        'idempotency_key': uuid.uuid4().hex,
     }
 
 
@@ -212,6 +276,7 @@ def scan(request, sku):
         ref_type = (request.POST.get('ref_type') or '').strip()
         ref_no = (request.POST.get('ref_no') or '').strip()
         remark = (request.POST.get('remark') or '').strip()
+        idempotency_key = (request.POST.get('idempotency_key') or '').strip()[:64]
 
         # keep user inputs if validation fails
         form_values = {
@@ -220,6 +285,7 @@ def scan(request, sku):
             'ref_type': ref_type,
             'ref_no': ref_no,
             'remark': remark,
+            'idempotency_key': idempotency_key or uuid.uuid4().hex,
         }
          # safe int conversion 
         try:
@@ -237,37 +303,31 @@ def scan(request, sku):
         valid_ref_types = {code for code, _ in StockMovement.REF_TYPES}
         if ref_type and ref_type not in valid_ref_types:
             error = "Invalid referrence type"
-        allowed_by_action = {
-            StockMovement.IN: {'SUP_INV', 'SUP_REQ', 'ADJ'},
-            StockMovement.OUT: {'CUS_INV', 'CUS_REQ', 'ADJ'},
-        }
+        allowed_by_action = StockMovement.ALLOWED_REF_TYPES
         if not error and ref_type and ref_type not in allowed_by_action.get(action, set()):
             error = "Selected Ref Type is not allowed for this action."
         if not error:
-            unit_price = product.price
-
-            StockMovement.objects.create(
-                product = product,
-                movement_type = action,
-                quantity = qty,
-                unit_price = unit_price,
-                ref_type = ref_type,
-                ref_no = ref_no,
-                remark = remark,
-                created_by=request.user,
-            )
-
-            #update stock 
+            try:
+                post_movement(
+                    product,
+                    action,
+                    qty,
+                    ref_type=ref_type,
+                    ref_no=ref_no,
+                    remark=remark,
+                    created_by=request.user,
+                    idempotency_key=idempotency_key,
+                )
+            except InsufficientStock as exc:
+                # another scanner got there first
+                error = str(exc)
+                product.stock = exc.available
+        if not error:
             if action == StockMovement.IN:
-                product.stock += qty
-                # product.save()
-                # return redirect('warehouse_scan', sku=sku)
                 messages.success(request, 'Stock IN recorded successfully.')
             else:
-                product.stock -= qty
                 messages.success(request, 'Stock OUT recorded successfully.')
-            
-            product.save(update_fields=['stock'])
+
             return redirect('warehouse_scan', sku=product.sku)
     movements_qs = StockMovement.objects.filter(product=product).order_by('-created_at')
     # # pagination 
@@ -291,41 +351,32 @@ def scan(request, sku):
     # return render(request, 'warehouse/scan.html', context)
     movements_qs = StockMovement.objects.filter(product=product).order_by('-created_at')
 
-# Totals (all records for this product)
-    total_in = movements_qs.filter(movement_type=StockMovement.IN).aggregate(s=Sum('quantity'))['s'] or 0
-    total_out = movements_qs.filter(movement_type=StockMovement.OUT).aggregate(s=Sum('quantity'))['s'] or 0
+    # Totals (all records for this product) come straight from the ledger
+    total_in = product.total_in
+    total_out = product.total_out
     net_total = total_in - total_out
 
-    # Pagination (20 per page)
-    paginator = Paginator(movements_qs, 10)
-    page_number = request.GET.get('page')
-    movements = paginator.get_page(page_number)
-
-    # Running balance for THIS PAGE (from current stock backwards)
-    running = product.stock
-    page_rows = []
-    for m in movements:  # movements is a Page object (iterable)
-        # Balance AFTER this movement happened (walking backward in time)
-        after = running
-
-        # Move backwards to compute "before"
-        if m.movement_type == StockMovement.IN:
-            before = running - m.quantity
-        else:
-            before = running + m.quantity
+    # Cursor pagination (10 per page): every page is an index seek, no OFFSET
+    movements = KeysetPaginator(movements_qs, 10).get_page(request.GET.get('cursor'))
+    record_count, count_capped = capped_count(movements_qs)
 
-        page_rows.append({
+    # Running balance is stored on each movement at posting time
+    page_rows = [
+        {
             "obj": m,
-            "balance_after": after,
-            "balance_before": before,
-        })
-        running = before
+            "balance_after": m.balance_after,
+            "balance_before": m.balance_before,
+        }
+        for m in movements
+    ]
 
     context = {
         'product': product,
         'error': error,
         'movements': movements,
         'rows': page_rows,              # ✅ use this in template instead of movements
+        'record_count': record_count,
+        'count_capped': count_capped,
         'ref_type_choices': ref_type_choices,
         'form_values': form_values,
         'total_in': total_in,
@@ -339,11 +390,13 @@ def scan(request, sku):
 # from django.utils import timezone
 # from datetime import timedelta
 
-@login_required
-@user_passes_test(is_warehouse_staff)
-def movement_list(request):
-    """All stock movements with filters + date range, suitable for printing receipts."""
+def _filtered_movements(request):
+    """
+    Stock movements matching the keyword/category/type/date filters of request.
 
+    Shared by the movement list and its exports. Returns (queryset, filters),
+    filters holding the cleaned values to echo back into the form.
+    """
     qs = (
         StockMovement.objects
         .select_related('product', 'product__category', 'created_by')
@@ -402,39 +455,173 @@ def movement_list(request):
         # swap if user entered reversed
         start_date, end_date = end_date, start_date
 
-    if start_date:
-        qs = qs.filter(created_at__date__gte=start_date)
-    if end_date:
-        qs = qs.filter(created_at__date__lte=end_date)
+    qs = qs.filter(**date_range_filter(start_date, end_date))
 
-    # --- Totals for the filtered result set ---
-    total_in = qs.filter(movement_type=StockMovement.IN).aggregate(s=Sum('quantity'))['s'] or 0
-    total_out = qs.filter(movement_type=StockMovement.OUT).aggregate(s=Sum('quantity'))['s'] or 0
-    net_total = total_in - total_out
+    filters = {
+        'keyword': keyword,
+        'selected_category': category_id,
+        'movement_type': movement_type,
+        'start': start_date_str,
+        'end': end_date_str,
+        'preset': preset,
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+    return qs, filters
 
-    value_in = qs.filter(movement_type=StockMovement.IN).aggregate(s=Sum('unit_price'))['s']
-    # The above is not correct value; compute value totals using Python over paginated rows or annotate if needed.
-    # We'll compute on the current page in the template using qty*unit_price, and show qty totals here.
 
-    # Pagination
-    paginator = Paginator(qs, 50)
-    page_number = request.GET.get('page')
-    movements = paginator.get_page(page_number)
+# Ranges at least this many days long are totalled from StockDailySummary
+ROLLUP_MIN_DAYS = 7
+
+
+def _movement_totals(qs, filters):
+    """
+    qty_in, qty_out, value_in and value_out (quantity * unit_price) of the
+    filtered movements.
+
+    Every filter of the movement list is either a product filter or a whole
+    local day, so StockDailySummary can answer it exactly: wide or open-ended
+    ranges read one row per product and day instead of every movement.
+    Narrow ranges are a single conditional aggregate over the movements.
+    """
+    start_date, end_date = filters['start_date'], filters['end_date']
+    wide = start_date is None or ((end_date or timezone.localdate()) - start_date).days + 1 >= ROLLUP_MIN_DAYS
+
+    if wide:
+        summaries = StockDailySummary.objects.all()
+        keyword = filters['keyword']
+        if keyword:
+            summaries = summaries.filter(
+                Q(product__product_name__icontains=keyword) |
+                Q(product__sku__icontains=keyword)
+            )
+        if filters['selected_category'].isdigit():
+            summaries = summaries.filter(product__category_id=int(filters['selected_category']))
+        if start_date:
+            summaries = summaries.filter(day__gte=start_date)
+        if end_date:
+            summaries = summaries.filter(day__lte=end_date)
+        totals = summaries.aggregate(
+            qty_in=Sum('qty_in'), qty_out=Sum('qty_out'), value_in=Sum('value_in'), value_out=Sum('income'),
+        )
+        if filters['movement_type'] == StockMovement.IN:
+            totals.update(qty_out=0, value_out=0)
+        elif filters['movement_type'] == StockMovement.OUT:
+            totals.update(qty_in=0, value_in=0)
+    else:
+        line_value = F('quantity') * F('unit_price')
+        is_in = Q(movement_type=StockMovement.IN)
+        is_out = Q(movement_type=StockMovement.OUT)
+        totals = qs.order_by().aggregate(
+            qty_in=Sum('quantity', filter=is_in),
+            qty_out=Sum('quantity', filter=is_out),
+            value_in=Sum(line_value, filter=is_in),
+            value_out=Sum(line_value, filter=is_out),
+        )
+    return {name: value or 0 for name, value in totals.items()}
+
+
+@login_required
+@user_passes_test(is_warehouse_staff)
+def movement_list(request):
+    """All stock movements with filters + date range, suitable for printing receipts."""
+
+    qs, filters = _filtered_movements(request)
+
+    # --- Totals for the filtered result set ---
+    totals = _movement_totals(qs, filters)
+    net_total = totals['qty_in'] - totals['qty_out']
+
+    # Cursor pagination: deep pages cost the same as the first one
+    movements = KeysetPaginator(qs, 50).get_page(request.GET.get('cursor'))
+    record_count, count_capped = capped_count(qs)
 
     categories = Category.objects.all().order_by('category_name')
 
     context = {
         'movements': movements,
         'categories': categories,
-        'keyword': keyword,
-        'selected_category': category_id,
-        'movement_type': movement_type,
-        'start': start_date_str,
-        'end': end_date_str,
-        'preset': preset,
-        'total_in': total_in,
-        'total_out': total_out,
+        'keyword': filters['keyword'],
+        'selected_category': filters['selected_category'],
+        'movement_type': filters['movement_type'],
+        'start': filters['start'],
+        'end': filters['end'],
+        'preset': filters['preset'],
+        'total_in': totals['qty_in'],
+        'total_out': totals['qty_out'],
         'net_total': net_total,
+        'value_in': totals['value_in'],
+        'value_out': totals['value_out'],
+        'record_count': record_count,
+        'count_capped': count_capped,
     }
     return render(request, 'warehouse/movements.html', context)
-    
\ No newline at end of file
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', stream_csv),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', stream_xlsx),
+}
+
+
+@login_required
+@user_passes_test(is_warehouse_staff)
+def movement_export(request):
+    """
+    Download the filtered movements as CSV or XLSX (?format=csv|xlsx).
+
+    Takes the same filters as the movement list. The file is streamed
+    straight from a database cursor, so any date range costs the same memory.
+    """
+    export_format = (request.GET.get('format') or 'csv').strip().lower()
+    if export_format not in EXPORT_FORMATS:
+        export_format = 'csv'
+    content_type, stream = EXPORT_FORMATS[export_format]
+
+    qs, filters = _filtered_movements(request)
+    # Oldest first reads naturally in a spreadsheet; (created_at, id) is indexed
+    qs = qs.order_by('created_at', 'id')
+
+    period = '_'.join(
+        date.isoformat() for date in (filters['start_date'], filters['end_date']) if date
+    ) or timezone.localdate().isoformat()
+    response = StreamingHttpResponse(stream(movement_rows(qs)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="movements_{period}.{export_format}"'
+    return response
+
+
+@login_required
+@user_passes_test(is_warehouse_staff)
+def movement_import(request):
+    """Bulk upload of stock movements from a CSV or JSON-lines file."""
+    errors = []
+
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        fmt = (request.POST.get('format') or '').strip().lower()
+        if upload and not fmt:
+            fmt = 'jsonl' if upload.name.lower().endswith(('.jsonl', '.json')) else 'csv'
+
+        if not upload:
+            errors = ['Please choose a file to upload.']
+        elif fmt not in ('csv', 'jsonl'):
+            errors = ['Unsupported file format.']
+        else:
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            started = time.perf_counter()
+            try:
+                count = import_movements(stream, fmt, created_by=request.user)
+            except ImportFailed as exc:
+                errors = exc.errors
+            except UnicodeDecodeError:
+                errors = ['File must be UTF-8 encoded.']
+            else:
+                elapsed = time.perf_counter() - started
+                messages.success(request, f'Imported {count} movements in {elapsed:.1f}s.')
+                return redirect('warehouse_movements')
+
+    context = {
+        'errors': errors,
+        'fields': IMPORT_FIELDS,
+    }
+    return render(request, 'warehouse/import.html', context)